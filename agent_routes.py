@@ -1,22 +1,54 @@
-from fastapi import APIRouter, Form, Depends, HTTPException, UploadFile, File
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi import APIRouter, Form, Depends, HTTPException, UploadFile, File, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse, FileResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import select, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.database import get_db
-from app.models import Agent, TaskProgress, SubmittedForm, AgentSession  # ✅ Added AgentSession import
-from app.schemas import AgentStatusUpdateSchema
-from app.security import hash_password, verify_password
+from app.database import get_db, get_async_db, SessionLocal, AsyncSessionLocal
+from app.models import Agent, TaskProgress, SubmittedForm, AgentSession, SubmissionRecord, Job, ImageAssignment, AgentStats  # ✅ Added AgentSession import
+from app.schemas import AgentStatusUpdateSchema, SubmissionBatchSchema
+from app.security import hash_password, hash_password_async, verify_password_async, PasswordHashingBusy
+from app.task_manifest import get_task_manifest, invalidate_task_manifest
+from app.image_variants import accepted_formats, best_variant, thumbnail_for, needs_variants, build_variants
+from app.exports import EXPORT_FORMATS, EXPORT_DIR, stream_export, write_export, export_filename
+from app.jobs import JobContext, job_handler, enqueue_job, job_status
+from app.submission_records import FORM_FIELDS, build_submission_record
+from app.group_commit import GROUP_COMMIT_ENABLED, submission_writer
+from app.task_ingest import (
+    IngestProgress, spool_upload, read_image_members, member_key, store_images, match_known_images, get_ingest_progress
+)
+from app.stats_counters import bump_stats, add_agent_stats, remove_agent_stats, status_change_stats, read_fleet_stats, reconcile_stats_now
+from app.live_events import broker, event_stream
+from app.session_reports import session_report_query, apply_cursor, encode_cursor, session_row, stream_session_csv
+from app.productivity_rollups import record_submissions, record_session, productivity_query, productivity_row, rebuild_rollups_now
+from app.submission_preview import (
+    PREVIEW_DEFAULT_LIMIT, PREVIEW_MAX_LIMIT, parse_columns, preview_query, apply_preview_cursor,
+    encode_preview_cursor, preview_row, estimate_total
+)
+from app.submission_search import (
+    SEARCH_DEFAULT_LIMIT, SEARCH_MAX_LIMIT, SEARCH_RANK_LIMIT, search_supported, build_match, search_query,
+    parse_search_cursor, encode_search_cursor, search_row, count_matches, format_total
+)
+from app.blob_store import find_known_blobs, register_blobs, deduplicate_agent_folders
+from app.task_assignments import (
+    assign_uploaded_images, get_next_assignment, get_or_seed_next_assignment, get_upcoming_assignments,
+    claim_next_assignment, claim_assignments, advance_progress, count_assignments
+)
 import os
 import secrets
 import string
 from datetime import datetime
 import json
 import zipfile
-import io
-import pandas as pd
 from typing import Optional
 
 router = APIRouter()
 
+# How many upcoming tasks the agent page may prefetch in one call
+PREFETCH_DEFAULT_LIMIT = 5
+PREFETCH_MAX_LIMIT = 50
+
 # Utility function to generate agent ID and password
 def generate_agent_credentials():
     agent_id = "AGT" + "".join(secrets.choice(string.digits) for _ in range(6))
@@ -25,16 +57,8 @@ def generate_agent_credentials():
 
 # Utility function to get images for specific agent
 def get_agent_image_files(agent_id: str):
-    """Get all image files assigned to a specific agent"""
-    agent_folder = f"static/task_images/agent_{agent_id}"
-    if not os.path.exists(agent_folder):
-        # Fallback to general folder
-        agent_folder = "static/task_images/crime_records_wide"
-    
-    if not os.path.exists(agent_folder):
-        return []
-    
-    return sorted([f for f in os.listdir(agent_folder) if f.lower().endswith(('.png', '.jpg', '.jpeg'))])
+    """Get all image files assigned to a specific agent (cached manifest)"""
+    return get_task_manifest(agent_id).images
 
 @router.post("/api/agents/register")
 async def register_agent(
@@ -44,12 +68,12 @@ async def register_agent(
     dob: str = Form(...),
     country: str = Form(...),
     gender: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Register a new agent with auto-generated credentials"""
     
     # Check if email already exists
-    existing_agent = db.query(Agent).filter(Agent.email == email).first()
+    existing_agent = await db.scalar(select(Agent.id).where(Agent.email == email))
     if existing_agent:
         raise HTTPException(status_code=400, detail="Email already registered")
     
@@ -59,7 +83,7 @@ async def register_agent(
     # Ensure unique agent ID (very unlikely collision, but safety first)
     max_attempts = 10
     attempt = 0
-    while db.query(Agent).filter(Agent.agent_id == agent_id).first() and attempt < max_attempts:
+    while await db.scalar(select(Agent.id).where(Agent.agent_id == agent_id)) and attempt < max_attempts:
         agent_id, password = generate_agent_credentials()
         attempt += 1
     
@@ -67,8 +91,8 @@ async def register_agent(
         raise HTTPException(status_code=500, detail="Failed to generate unique agent ID")
     
     try:
-        # Create new agent
-        hashed_pwd = hash_password(password)
+        # Create new agent (bcrypt runs off the event loop)
+        hashed_pwd = await hash_password_async(password)
         new_agent = Agent(
             agent_id=agent_id,
             name=name,
@@ -82,13 +106,14 @@ async def register_agent(
         )
         
         db.add(new_agent)
-        db.commit()
-        db.refresh(new_agent)
+        await db.commit()
         
-        # Create initial task progress entry
+        # Create initial task progress entry and dashboard counters
         progress = TaskProgress(agent_id=agent_id, current_index=0)
         db.add(progress)
-        db.commit()
+        await db.run_sync(add_agent_stats, agent_id, True)
+        await db.commit()
+        broker.publish("agent_registered", {"agent_id": agent_id, "name": name, "email": email, "status": "active"})
         
         return {
             "success": True,
@@ -103,27 +128,82 @@ async def register_agent(
             }
         }
         
+    except PasswordHashingBusy:
+        raise HTTPException(status_code=503, detail="Server busy, please retry")
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Registration failed: {str(e)}")
 
+AGENT_SESSION_FIELDS = {"last_login", "last_logout", "current_session_duration", "is_currently_logged_in", "recent_sessions"}
+
+def _format_time(value):
+    return value.strftime('%Y-%m-%d %H:%M:%S') if value else None
+
+def get_recent_sessions(db: Session, agent_ids=None, per_agent: int = 5):
+    """Latest sessions per agent in one windowed query, grouped by agent_id"""
+    ranked = select(
+        AgentSession.agent_id,
+        AgentSession.login_time,
+        AgentSession.logout_time,
+        AgentSession.duration_minutes,
+        func.row_number().over(
+            partition_by=AgentSession.agent_id,
+            order_by=(AgentSession.login_time.desc(), AgentSession.id.desc())
+        ).label("rank")
+    )
+    if agent_ids is not None:
+        ranked = ranked.where(AgentSession.agent_id.in_(agent_ids))
+    ranked = ranked.subquery()
+    
+    rows = db.execute(
+        select(ranked.c.agent_id, ranked.c.login_time, ranked.c.logout_time, ranked.c.duration_minutes)
+        .where(ranked.c.rank <= per_agent)
+        .order_by(ranked.c.agent_id, ranked.c.rank)
+    ).all()
+    
+    sessions = {}
+    for row in rows:
+        sessions.setdefault(row.agent_id, []).append(row)
+    return sessions
+
 @router.get("/api/agents")
-def get_all_agents(db: Session = Depends(get_db)):
-    agents = db.query(Agent).all()
-    result = []
+def get_all_agents(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[int] = None,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """List agents with completion counts and recent sessions in a constant number of queries"""
+    wanted = {f.strip() for f in fields.split(",") if f.strip()} if fields else None
     
-    for agent in agents:
-        # Get task completion count
-        completed_count = db.query(SubmittedForm).filter(SubmittedForm.agent_id == agent.agent_id).count()
-        
-        # Get login/logout times with proper error handling
+    # Submission counts come from the maintained per-agent counters
+    query = db.query(Agent, func.coalesce(AgentStats.submissions, 0)).outerjoin(
+        AgentStats, AgentStats.agent_id == Agent.agent_id
+    ).order_by(Agent.id)
+    
+    # Keyset pagination on the primary key
+    if cursor is not None:
+        query = query.filter(Agent.id > cursor)
+    if limit is not None:
+        rows = query.limit(limit + 1).all()
+        if len(rows) > limit:
+            rows = rows[:limit]
+            response.headers["X-Next-Cursor"] = str(rows[-1][0].id)
+    else:
+        rows = query.all()
+    
+    sessions_by_agent = {}
+    if wanted is None or wanted & AGENT_SESSION_FIELDS:
         try:
-            login_sessions = db.query(AgentSession).filter(
-                AgentSession.agent_id == agent.agent_id
-            ).order_by(AgentSession.login_time.desc()).limit(5).all()
+            page_ids = [agent.agent_id for agent, _ in rows] if limit is not None else None
+            sessions_by_agent = get_recent_sessions(db, page_ids)
         except Exception as e:
-            print(f"Error querying sessions for agent {agent.agent_id}: {e}")
-            login_sessions = []
+            print(f"Error querying agent sessions: {e}")
+    
+    result = []
+    for agent, completed_count in rows:
+        login_sessions = sessions_by_agent.get(agent.agent_id, [])
         
         last_login = None
         last_logout = None
@@ -132,14 +212,14 @@ def get_all_agents(db: Session = Depends(get_db)):
         if login_sessions:
             # Find current active session
             current_session = next((s for s in login_sessions if s.logout_time is None), None)
-            last_login = login_sessions[0].login_time.strftime('%Y-%m-%d %H:%M:%S') if login_sessions[0].login_time else None
+            last_login = _format_time(login_sessions[0].login_time)
             
             # Find last completed session
             completed_sessions = [s for s in login_sessions if s.logout_time is not None]
             if completed_sessions:
-                last_logout = completed_sessions[0].logout_time.strftime('%Y-%m-%d %H:%M:%S')
+                last_logout = _format_time(completed_sessions[0].logout_time)
         
-        result.append({
+        item = {
             "id": agent.id,
             "agent_id": agent.agent_id,
             "name": agent.name,
@@ -154,12 +234,15 @@ def get_all_agents(db: Session = Depends(get_db)):
             "is_currently_logged_in": current_session is not None,
             "recent_sessions": [
                 {
-                    "login_time": s.login_time.strftime('%Y-%m-%d %H:%M:%S') if s.login_time else None,
-                    "logout_time": s.logout_time.strftime('%Y-%m-%d %H:%M:%S') if s.logout_time else None,
+                    "login_time": _format_time(s.login_time),
+                    "logout_time": _format_time(s.logout_time),
                     "duration_minutes": s.duration_minutes
                 } for s in login_sessions
             ]
-        })
+        }
+        if wanted is not None:
+            item = {key: value for key, value in item.items() if key in wanted}
+        result.append(item)
     
     return result
 
@@ -207,8 +290,10 @@ def update_agent_status(agent_id: str, status_data: AgentStatusUpdateSchema, db:
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
     
+    status_change_stats(db, agent.status, status_data.status)
     agent.status = status_data.status
     db.commit()
+    broker.publish("agent_status", {"agent_id": agent_id, "status": agent.status})
     return {"message": "Agent status updated successfully"}
 
 @router.delete("/api/agents/{agent_id}")
@@ -217,18 +302,28 @@ def delete_agent(agent_id: int, db: Session = Depends(get_db)):
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
     
+    remove_agent_stats(db, agent.agent_id, agent.status == "active")
     db.delete(agent)
     db.commit()
+    broker.publish("agent_deleted", {"agent_id": agent.agent_id})
     return {"message": "Agent deleted successfully"}
 
 @router.post("/api/agents/login")
 async def login_agent(
     agent_id: str = Form(...),
     password: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    agent = db.query(Agent).filter(Agent.agent_id == agent_id).first()
-    if not agent or not verify_password(password, agent.hashed_password):
+    agent = await db.scalar(select(Agent).where(Agent.agent_id == agent_id))
+    if not agent:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    
+    # bcrypt runs on a bounded pool off the event loop
+    try:
+        verified = await verify_password_async(password, agent.hashed_password)
+    except PasswordHashingBusy:
+        raise HTTPException(status_code=503, detail="Server busy, please retry login")
+    if not verified:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     if agent.status != "active":
@@ -236,15 +331,16 @@ async def login_agent(
     
     try:
         # End any existing active sessions for this agent
-        active_sessions = db.query(AgentSession).filter(
+        active_sessions = (await db.scalars(select(AgentSession).where(
             AgentSession.agent_id == agent_id,
             AgentSession.logout_time.is_(None)
-        ).all()
+        ))).all()
         
         for session in active_sessions:
             session.logout_time = datetime.utcnow()
             duration = (session.logout_time - session.login_time).total_seconds() / 60
             session.duration_minutes = round(duration, 2)
+            await db.run_sync(record_session, agent_id, session.login_time, session.logout_time)
         
         # Create new session
         new_session = AgentSession(
@@ -255,7 +351,12 @@ async def login_agent(
         )
         
         db.add(new_session)
-        db.commit()
+        await db.commit()
+        broker.publish("login", {
+            "agent_id": agent.agent_id,
+            "name": agent.name,
+            "login_time": _format_time(new_session.login_time)
+        }, stats_changed=False)
         
         return {
             "message": "Login successful", 
@@ -274,24 +375,30 @@ async def login_agent(
         }
 
 @router.post("/api/agents/{agent_id}/logout")
-async def logout_agent(agent_id: str, db: Session = Depends(get_db)):
+async def logout_agent(agent_id: str, db: AsyncSession = Depends(get_async_db)):
     """Handle agent logout and update session"""
-    agent = db.query(Agent).filter(Agent.agent_id == agent_id).first()
+    agent = await db.scalar(select(Agent).where(Agent.agent_id == agent_id))
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
     
     try:
         # Find active session
-        active_session = db.query(AgentSession).filter(
+        active_session = await db.scalar(select(AgentSession).where(
             AgentSession.agent_id == agent_id,
             AgentSession.logout_time.is_(None)
-        ).first()
+        ).limit(1))
         
         if active_session:
             active_session.logout_time = datetime.utcnow()
             duration = (active_session.logout_time - active_session.login_time).total_seconds() / 60
             active_session.duration_minutes = round(duration, 2)
-            db.commit()
+            await db.run_sync(record_session, agent_id, active_session.login_time, active_session.logout_time)
+            await db.commit()
+            broker.publish("logout", {
+                "agent_id": agent_id,
+                "logout_time": _format_time(active_session.logout_time),
+                "duration_minutes": active_session.duration_minutes
+            }, stats_changed=False)
             
             return {
                 "message": "Logout successful",
@@ -303,24 +410,30 @@ async def logout_agent(agent_id: str, db: Session = Depends(get_db)):
     return {"message": "Logout successful"}
 
 @router.post("/api/admin/force-logout/{agent_id}")
-async def force_logout_agent(agent_id: str, db: Session = Depends(get_db)):
+async def force_logout_agent(agent_id: str, db: AsyncSession = Depends(get_async_db)):
     """Admin force logout an agent"""
-    agent = db.query(Agent).filter(Agent.agent_id == agent_id).first()
+    agent = await db.scalar(select(Agent).where(Agent.agent_id == agent_id))
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
     
     try:
         # End active session
-        active_session = db.query(AgentSession).filter(
+        active_session = await db.scalar(select(AgentSession).where(
             AgentSession.agent_id == agent_id,
             AgentSession.logout_time.is_(None)
-        ).first()
+        ).limit(1))
         
         if active_session:
             active_session.logout_time = datetime.utcnow()
             duration = (active_session.logout_time - active_session.login_time).total_seconds() / 60
             active_session.duration_minutes = round(duration, 2)
-            db.commit()
+            await db.run_sync(record_session, agent_id, active_session.login_time, active_session.logout_time)
+            await db.commit()
+            broker.publish("logout", {
+                "agent_id": agent_id,
+                "logout_time": _format_time(active_session.logout_time),
+                "duration_minutes": active_session.duration_minutes
+            }, stats_changed=False)
             
             return {
                 "message": f"Agent {agent_id} has been forcefully logged out",
@@ -333,48 +446,48 @@ async def force_logout_agent(agent_id: str, db: Session = Depends(get_db)):
 
 @router.get("/api/admin/session-report")
 async def get_session_report(
+    response: Response,
     agent_id: Optional[str] = None,
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
-    db: Session = Depends(get_db)
+    limit: Optional[int] = Query(None, ge=1, le=5000),
+    cursor: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|csv)$"),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get detailed session report for admin"""
-    try:
-        query = db.query(AgentSession)
-        
-        if agent_id:
-            query = query.filter(AgentSession.agent_id == agent_id)
-        
-        if date_from:
-            from_date = datetime.fromisoformat(date_from)
-            query = query.filter(AgentSession.login_time >= from_date)
-        
-        if date_to:
-            to_date = datetime.fromisoformat(date_to)
-            query = query.filter(AgentSession.login_time <= to_date)
-        
-        sessions = query.order_by(AgentSession.login_time.desc()).all()
-        
-        result = []
-        for session in sessions:
-            agent = db.query(Agent).filter(Agent.agent_id == session.agent_id).first()
-            result.append({
-                "session_id": session.id,
-                "agent_id": session.agent_id,
-                "agent_name": agent.name if agent else "Unknown",
-                "login_time": session.login_time.isoformat(),
-                "logout_time": session.logout_time.isoformat() if session.logout_time else None,
-                "duration_minutes": session.duration_minutes,
-                "is_active": session.logout_time is None
-            })
-        
-        return result
-    except Exception as e:
-        print(f"Session report error: {e}")
-        return []
+    """Get detailed session report for admin (one join; keyset pages or a streamed CSV)"""
+    query = session_report_query(
+        agent_id,
+        _parse_filter_date(date_from, "date_from") if date_from else None,
+        _parse_filter_date(date_to, "date_to") if date_to else None
+    )
+    
+    if format == "csv":
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return StreamingResponse(
+            stream_session_csv(query),
+            media_type="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="session_report_{timestamp}.csv"'}
+        )
+    
+    # Keyset pagination on (login_time, id), newest first
+    if cursor:
+        try:
+            query = apply_cursor(query, cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    if limit is not None:
+        rows = (await db.execute(query.limit(limit + 1))).all()
+        if len(rows) > limit:
+            rows = rows[:limit]
+            response.headers["X-Next-Cursor"] = encode_cursor(rows[-1])
+    else:
+        rows = (await db.execute(query)).all()
+    
+    return [session_row(row) for row in rows]
 
 @router.get("/api/agents/{agent_id}/current-task")
-def get_current_task(agent_id: str, db: Session = Depends(get_db)):
+def get_current_task(agent_id: str, request: Request, formats: Optional[str] = None, db: Session = Depends(get_db)):
     # Verify agent exists
     agent = db.query(Agent).filter(Agent.agent_id == agent_id).first()
     if not agent:
@@ -388,13 +501,15 @@ def get_current_task(agent_id: str, db: Session = Depends(get_db)):
         db.commit()
         db.refresh(progress)
 
-    # Get images for this specific agent
-    image_files = get_agent_image_files(agent_id)
+    # Next pending image comes from the assignments table (indexed single-row lookup)
+    assignment = get_or_seed_next_assignment(db, agent_id)
+    db.commit()  # keep any assignments seeded from disk
+    total_images = count_assignments(db, agent_id)
     
-    if not image_files:
+    if not total_images:
         return {"message": "No tasks assigned", "completed": True}
     
-    if progress.current_index >= len(image_files):
+    if assignment is None:
         # Get total completed count
         completed_count = db.query(SubmittedForm).filter(SubmittedForm.agent_id == agent_id).count()
         return {
@@ -403,28 +518,95 @@ def get_current_task(agent_id: str, db: Session = Depends(get_db)):
             "total_completed": completed_count
         }
 
-    current_image = image_files[progress.current_index]
+    return task_descriptor(assignment, total_images, accepted_formats(request.headers.get("accept"), formats))
+
+@router.get("/api/agents/{agent_id}/tasks")
+def get_upcoming_tasks(
+    agent_id: str,
+    request: Request,
+    from_position: Optional[int] = Query(None, alias="from", ge=0),
+    limit: int = Query(PREFETCH_DEFAULT_LIMIT, ge=1, le=PREFETCH_MAX_LIMIT),
+    formats: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Upcoming pending tasks (from a task index onwards) so the agent page can preload their images"""
+    agent = db.query(Agent.id).filter(Agent.agent_id == agent_id).first()
+    if not agent:
+        raise HTTPException(status_code=404, detail="Agent not found")
     
-    # Determine the correct path
-    agent_folder = f"static/task_images/agent_{agent_id}"
-    if os.path.exists(agent_folder) and current_image in os.listdir(agent_folder):
-        image_url = f"/static/task_images/agent_{agent_id}/{current_image}"
-    else:
-        image_url = f"/static/task_images/crime_records_wide/{current_image}"
+    # Make sure agents with images only on disk get their assignments first
+    get_or_seed_next_assignment(db, agent_id)
+    db.commit()
+    total_images = count_assignments(db, agent_id)
+    
+    accepted = accepted_formats(request.headers.get("accept"), formats)
+    assignments = get_upcoming_assignments(db, agent_id, from_position, limit)
+    return {
+        "tasks": [task_descriptor(assignment, total_images, accepted) for assignment in assignments],
+        "total_images": total_images
+    }
 
+def task_descriptor(assignment: ImageAssignment, total_images: int, formats: set) -> dict:
+    """What the agent page needs to show one task"""
+    # Serve the smallest variant this client can display
+    image_path = best_variant(assignment.image_path, formats)
+    thumbnail_path = thumbnail_for(assignment.image_path)
+    
     return {
-        "image_url": image_url,
-        "image_name": current_image,
-        "progress": f"{progress.current_index + 1}/{len(image_files)}",
-        "current_index": progress.current_index,
-        "total_images": len(image_files),
-        "task_number": progress.current_index + 1,
+        "image_url": f"/{image_path}",
+        "original_url": f"/{assignment.image_path}",
+        "thumbnail_url": f"/{thumbnail_path}" if thumbnail_path else None,
+        "image_name": assignment.image_filename,
+        "progress": f"{assignment.position + 1}/{total_images}",
+        "current_index": assignment.position,
+        "total_images": total_images,
+        "task_number": assignment.position + 1,
         "completed": False
     }
 
+def next_task_descriptor(db: Session, agent_id: str, formats: set):
+    assignment = get_next_assignment(db, agent_id)
+    if assignment is None:
+        return None
+    return task_descriptor(assignment, count_assignments(db, agent_id), formats)
+
+async def record_submission(db: AsyncSession, agent_id: str, fields: dict) -> dict:
+    """Save one submission against the agent's current task and advance progress (flushes, does not commit)"""
+    # Claim the assignment this submission completes (safe against concurrent submits)
+    submitted_at = datetime.utcnow()
+    assignment = await db.run_sync(claim_next_assignment, agent_id, submitted_at)
+    
+    # Track which image this data is for
+    form_data = dict(fields, image_name=assignment.image_filename if assignment else None)
+    
+    # Save submission
+    submission = SubmittedForm(
+        agent_id=agent_id,
+        form_data=json.dumps(form_data),
+        submitted_at=submitted_at
+    )
+    db.add(submission)
+    await db.flush()
+    
+    # Typed copy of the fields for SQL filtering and exports
+    db.add(build_submission_record(submission, form_data))
+    await db.run_sync(bump_stats, agent_id, submissions=1)
+    await db.run_sync(record_submissions, agent_id, submitted_at)
+    
+    # ✅ IMPORTANT: Update progress to next task AFTER successful submission
+    next_index = await db.run_sync(advance_progress, agent_id, assignment.position + 1 if assignment else None)
+    
+    await db.flush()
+    
+    return {
+        "submission_id": submission.id,
+        "next_task_index": next_index or 0
+    }
+
 @router.post("/api/agents/{agent_id}/submit")
 async def submit_task_data(
     agent_id: str,
+    request: Request,
     DR_NO: str = Form(...),
     Date_Rptd: str = Form(...),
     DATE_OCC: str = Form(...),
@@ -455,24 +637,15 @@ async def submit_task_data(
     LON: str = Form(...),
     Point: str = Form(...),
     Shape__Area: str = Form(...),
-    db: Session = Depends(get_db)
+    formats: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Verify agent exists
-    agent = db.query(Agent).filter(Agent.agent_id == agent_id).first()
+    agent = await db.scalar(select(Agent.id).where(Agent.agent_id == agent_id))
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
     
-    # Get current progress to know which image this relates to
-    progress = db.query(TaskProgress).filter(TaskProgress.agent_id == agent_id).first()
-    current_image_name = None
-    
-    if progress:
-        image_files = get_agent_image_files(agent_id)
-        if progress.current_index < len(image_files):
-            current_image_name = image_files[progress.current_index]
-    
-    # Create form data dictionary
-    form_data = {
+    fields = {
         "DR_NO": DR_NO, "Date_Rptd": Date_Rptd, "DATE_OCC": DATE_OCC, "TIME_OCC": TIME_OCC,
         "Unique_Identifier": Unique_Identifier, "AREA_NAME": AREA_NAME, "Rpt_Dist_No": Rpt_Dist_No,
         "VIN": VIN, "Crm": Crm, "Crm_Cd_Desc": Crm_Cd_Desc, "Mocodes": Mocodes,
@@ -481,67 +654,301 @@ async def submit_task_data(
         "PD_DESC": PD_DESC, "CCD_LONCOD": CCD_LONCOD, "Status_Desc": Status_Desc,
         "LAW_CODE": LAW_CODE, "SubAgency": SubAgency, "Charge": Charge, "Race": Race,
         "LOCATION": LOCATION, "SeqID": SeqID, "LAT": LAT, "LON": LON,
-        "Point": Point, "Shape__Area": Shape__Area,
-        "image_name": current_image_name  # Track which image this data is for
+        "Point": Point, "Shape__Area": Shape__Area
     }
     
-    # Save submission
-    submission = SubmittedForm(
-        agent_id=agent_id,
-        form_data=json.dumps(form_data),
-        submitted_at=datetime.utcnow()
+    if GROUP_COMMIT_ENABLED:
+        # Shares one transaction with submissions from other requests; hand our
+        # pooled connection back first so the writer can never wait on it
+        await db.close()
+        result = await submission_writer.submit(lambda session: record_submission(session, agent_id, fields))
+    else:
+        result = await record_submission(db, agent_id, fields)
+        await db.commit()
+    broker.publish("submission", {"agent_id": agent_id, "count": 1, "next_task_index": result["next_task_index"]})
+    
+    # Hand back the next task inline so the page needs no second round trip
+    accepted = accepted_formats(request.headers.get("accept"), formats)
+    next_task = await db.run_sync(next_task_descriptor, agent_id, accepted)
+    
+    return {
+        "message": "Task submitted successfully", 
+        "success": True,
+        **result,
+        "next_task": next_task
+    }
+
+async def record_submission_batch(db: AsyncSession, agent_id: str, client_id: str, records: list) -> dict:
+    """Save queued entries in task order in one transaction, skipping ones already stored (flushes, does not commit)"""
+    by_key = {f"{client_id}:{record.sequence}": record for record in records}
+    existing = dict((await db.execute(
+        select(SubmittedForm.idempotency_key, SubmittedForm.id).where(
+            SubmittedForm.agent_id == agent_id,
+            SubmittedForm.idempotency_key.in_(list(by_key))
+        )
+    )).all())
+    fresh = sorted(
+        ((key, record) for key, record in by_key.items() if key not in existing),
+        key=lambda item: item[1].sequence
     )
-    db.add(submission)
     
-    # ✅ IMPORTANT: Update progress to next task AFTER successful submission
-    if progress:
-        progress.current_index += 1
+    # Claim one assignment per new entry, in the order the agent typed them
+    submitted_at = datetime.utcnow()
+    assignments = await db.run_sync(claim_assignments, agent_id, len(fresh), submitted_at)
     
-    db.commit()
+    stored = []
+    for offset, (key, record) in enumerate(fresh):
+        assignment = assignments[offset] if offset < len(assignments) else None
+        form_data = dict(record.fields, image_name=assignment.image_filename if assignment else None)
+        submission = SubmittedForm(
+            agent_id=agent_id,
+            form_data=json.dumps(form_data),
+            submitted_at=submitted_at,
+            idempotency_key=key
+        )
+        stored.append((key, submission, form_data))
+    db.add_all(submission for _, submission, _ in stored)
+    await db.flush()
     
+    # Typed copies for SQL filtering and exports
+    db.add_all(build_submission_record(submission, form_data) for _, submission, form_data in stored)
+    await db.run_sync(bump_stats, agent_id, submissions=len(stored))
+    await db.run_sync(record_submissions, agent_id, submitted_at, len(stored))
+    
+    # Progress moves once for the whole batch
+    if assignments:
+        next_index = await db.run_sync(advance_progress, agent_id, assignments[-1].position + 1)
+    else:
+        next_index = await db.scalar(select(TaskProgress.current_index).where(TaskProgress.agent_id == agent_id))
+    await db.flush()
+    
+    new_ids = {key: submission.id for key, submission, _ in stored}
     return {
-        "message": "Task submitted successfully", 
+        "accepted": len(stored),
+        "duplicates": len(existing),
+        "results": [
+            {
+                "sequence": record.sequence,
+                "submission_id": new_ids.get(key) or existing.get(key),
+                "status": "stored" if key in new_ids else "duplicate"
+            }
+            for key, record in by_key.items()
+        ],
+        "next_task_index": next_index or 0
+    }
+
+@router.post("/api/agents/{agent_id}/submit-batch")
+async def submit_task_batch(
+    agent_id: str,
+    batch: SubmissionBatchSchema,
+    request: Request,
+    formats: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Store entries an agent queued locally (e.g. while offline); safe to retry"""
+    # Verify agent exists
+    agent = await db.scalar(select(Agent.id).where(Agent.agent_id == agent_id))
+    if not agent:
+        raise HTTPException(status_code=404, detail="Agent not found")
+    
+    # Same fields as the single-record form
+    for record in batch.records:
+        missing = [field for field in FORM_FIELDS if field not in record.fields]
+        unknown = [field for field in record.fields if field not in FORM_FIELDS]
+        if missing or unknown:
+            raise HTTPException(
+                status_code=422,
+                detail=f"Record {record.sequence}: missing fields {missing}, unknown fields {unknown}"
+            )
+    
+    try:
+        result = await record_submission_batch(db, agent_id, batch.client_id, batch.records)
+        await db.commit()
+    except IntegrityError:
+        # A concurrent retry of this batch committed first; its entries now count as duplicates
+        await db.rollback()
+        result = await record_submission_batch(db, agent_id, batch.client_id, batch.records)
+        await db.commit()
+    if result["accepted"]:
+        broker.publish("submission", {
+            "agent_id": agent_id,
+            "count": result["accepted"],
+            "next_task_index": result["next_task_index"]
+        })
+    
+    accepted = accepted_formats(request.headers.get("accept"), formats)
+    next_task = await db.run_sync(next_task_descriptor, agent_id, accepted)
+    
+    return {
+        "message": "Batch submitted successfully",
         "success": True,
-        "submission_id": submission.id,
-        "next_task_index": progress.current_index if progress else 0
+        **result,
+        "next_task": next_task
     }
 
 # ===== ADMIN ROUTES =====
 
 @router.get("/api/admin/statistics")
 def get_admin_statistics(db: Session = Depends(get_db)):
-    """Get system statistics for admin dashboard"""
-    total_agents = db.query(Agent).count()
-    active_agents = db.query(Agent).filter(Agent.status == "active").count()
-    total_submissions = db.query(SubmittedForm).count()
+    """Get system statistics for admin dashboard (one row of maintained counters)"""
+    fleet = read_fleet_stats(db)
+    return {
+        "total_agents": fleet.total_agents,
+        "active_agents": fleet.active_agents,
+        "total_tasks": fleet.total_tasks,
+        "completed_tasks": fleet.submissions,
+        "pending_tasks": fleet.pending_tasks
+    }
+
+@router.get("/api/admin/metrics/productivity")
+async def get_productivity_metrics(
+    granularity: str = Query("day", pattern="^(hour|day)$"),
+    agent_id: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    per_agent: bool = True,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Submissions, active minutes and records per hour in hourly/daily buckets (reads rollups only)"""
+    query = productivity_query(
+        granularity,
+        agent_id,
+        _parse_filter_date(date_from, "date_from") if date_from else None,
+        _parse_filter_date(date_to, "date_to", end_of_day=True) if date_to else None,
+        per_agent
+    )
+    rows = (await db.execute(query)).all()
+    return {
+        "granularity": granularity,
+        "buckets": [productivity_row(row, per_agent) for row in rows]
+    }
+
+@router.post("/api/admin/metrics/productivity/rebuild")
+async def rebuild_productivity_metrics():
+    """Recompute the productivity rollups from raw submissions and sessions"""
+    buckets = await run_in_threadpool(rebuild_rollups_now)
+    return {"message": "Productivity rollups rebuilt", "buckets": buckets}
+
+@router.get("/api/admin/events")
+async def admin_event_stream(request: Request):
+    """Server-Sent Events feed of logins, logouts, submissions and stats for the dashboard"""
+    return StreamingResponse(
+        event_stream(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/api/admin/statistics/reconcile")
+async def reconcile_admin_statistics():
+    """Recount the dashboard counters from the source tables"""
+    agents = await run_in_threadpool(reconcile_stats_now)
+    broker.stats_dirty = True
+    return {"message": "Statistics reconciled", "agents": agents}
+
+async def ingest_task_zip(db: AsyncSession, agent_id: str, zip_path: str, progress: IngestProgress) -> dict:
+    """Store a spooled ZIP's images in the shared blob store and queue them as the agent's tasks"""
+    members = await read_image_members(zip_path)
+    progress.set_status("extracting", total=len(members))
+    
+    # The ZIP directory's (crc32, size) only nominates stored blobs; a member reuses one
+    # after its sha256 matches, otherwise it is stored as new content
+    candidates = await db.run_sync(find_known_blobs, {member_key(member) for member in members})
+    known = await match_known_images(
+        zip_path, [member for member in members if member_key(member) in candidates], candidates
+    )
+    new_members = [member for member in members if member not in known]
+    progress.advance(len(known))
+    
+    # New members are hashed and copied in chunks on the ingest worker pool
+    stored = await store_images(zip_path, new_members, progress)
+    stored_paths = dict(zip(new_members, (blob["path"] for blob in stored)))
     
-    # Calculate total tasks (images) across all agents
-    total_tasks = 0
-    for agent in db.query(Agent).all():
-        agent_images = get_agent_image_files(agent.agent_id)
-        total_tasks += len(agent_images)
+    images = []
+    for member in members:
+        path = known[member].path if member in known else stored_paths[member]
+        images.append((os.path.basename(member.filename), path))
     
-    # Pending tasks = total tasks - completed tasks
-    pending_tasks = max(0, total_tasks - total_submissions)
+    await db.run_sync(register_blobs, stored)
+    await db.run_sync(assign_uploaded_images, agent_id, images)
+    await db.commit()
+    broker.publish("tasks_assigned", {"agent_id": agent_id, "count": len(images)})
+    invalidate_task_manifest(agent_id)
+    progress.set_status("completed")
+    
+    # WebP/thumbnail variants are built afterwards on the image process pool
+    if stored:
+        await enqueue_job("variants", {"paths": sorted({blob["path"] for blob in stored})})
     
     return {
-        "total_agents": total_agents,
-        "active_agents": active_agents,
-        "total_tasks": total_tasks,
-        "completed_tasks": total_submissions,
-        "pending_tasks": pending_tasks
+        "message": "Images uploaded successfully",
+        "agent_id": agent_id,
+        "images_processed": len(images),
+        "images_stored": len({blob["digest"] for blob in stored}),
+        "images_deduplicated": len(images) - len({blob["digest"] for blob in stored})
     }
 
+@job_handler("upload")
+async def run_upload_job(params: dict, context: JobContext):
+    progress = IngestProgress(params["agent_id"], on_update=context.report)
+    try:
+        async with AsyncSessionLocal() as db:
+            return await ingest_task_zip(db, params["agent_id"], params["zip_path"], progress)
+    except zipfile.BadZipFile:
+        progress.set_status("failed")
+        raise ValueError("Invalid ZIP file")
+    except Exception:
+        progress.set_status("failed")
+        raise
+    finally:
+        os.remove(params["zip_path"])
+
+@job_handler("variants")
+async def run_variants_job(params: dict, context: JobContext):
+    pending = await run_in_threadpool(lambda: [path for path in params["paths"] if needs_variants(path)])
+    context.report(0, len(pending))
+    created = await build_variants(pending, lambda done, total: context.report(done, total))
+    return {"images": len(pending), "variants_created": created}
+
+@router.post("/api/admin/images/build-variants")
+async def build_image_variants(agent_id: Optional[str] = Form(None), db: AsyncSession = Depends(get_async_db)):
+    """Queue variant generation for one agent's task images, or for every assigned image"""
+    query = select(ImageAssignment.image_path).distinct()
+    if agent_id:
+        query = query.where(ImageAssignment.agent_id == agent_id)
+    paths = sorted((await db.scalars(query)).all())
+    if not paths:
+        raise HTTPException(status_code=404, detail="No task images found")
+    
+    job_id = await enqueue_job("variants", {"paths": paths})
+    return JSONResponse(status_code=202, content={"message": "Variant generation queued", "job_id": job_id})
+
+@job_handler("dedupe")
+async def run_dedupe_job(params: dict, context: JobContext):
+    def deduplicate():
+        db = SessionLocal()
+        try:
+            return deduplicate_agent_folders(db, context.report)
+        finally:
+            db.close()
+    return await run_in_threadpool(deduplicate)
+
+@router.post("/api/admin/images/deduplicate")
+async def deduplicate_task_images():
+    """Move per-agent image copies into the shared blob store (one copy per distinct file)"""
+    job_id = await enqueue_job("dedupe", {})
+    return JSONResponse(status_code=202, content={"message": "Deduplication queued", "job_id": job_id})
+
 @router.post("/api/admin/upload-tasks")
 async def upload_task_images(
     agent_id: str = Form(...),
     zip_file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    background: bool = Form(False),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Upload ZIP file with images and assign to specific agent"""
     
     # Verify agent exists
-    agent = db.query(Agent).filter(Agent.agent_id == agent_id).first()
+    agent = await db.scalar(select(Agent.id).where(Agent.agent_id == agent_id))
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
     
@@ -549,210 +956,260 @@ async def upload_task_images(
     if not zip_file.filename.endswith('.zip'):
         raise HTTPException(status_code=400, detail="File must be a ZIP archive")
     
+    # Spool the upload to a temp file instead of reading it into memory
+    zip_path = await spool_upload(zip_file)
+    
+    if background:
+        # The job owns the temp file from here on
+        job_id = await enqueue_job("upload", {"agent_id": agent_id, "zip_path": zip_path})
+        return JSONResponse(status_code=202, content={
+            "message": "Upload queued",
+            "job_id": job_id,
+            "status_url": f"/api/admin/jobs/{job_id}"
+        })
+    
+    progress = IngestProgress(agent_id)
     try:
-        # Create agent-specific directory
-        agent_dir = f"static/task_images/agent_{agent_id}"
-        os.makedirs(agent_dir, exist_ok=True)
-        
-        # Read ZIP file content
-        zip_content = await zip_file.read()
-        
-        images_processed = 0
-        supported_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff'}
-        
-        with zipfile.ZipFile(io.BytesIO(zip_content), 'r') as zip_ref:
-            for file_info in zip_ref.filelist:
-                # Skip directories and non-image files
-                if file_info.is_dir():
-                    continue
-                
-                file_ext = os.path.splitext(file_info.filename.lower())[1]
-                if file_ext not in supported_extensions:
-                    continue
-                
-                # Extract image
-                with zip_ref.open(file_info) as source_file:
-                    # Create safe filename (remove path components)
-                    safe_filename = os.path.basename(file_info.filename)
-                    if not safe_filename:
-                        continue
-                    
-                    # Ensure unique filename
-                    counter = 1
-                    original_name = safe_filename
-                    while os.path.exists(os.path.join(agent_dir, safe_filename)):
-                        name, ext = os.path.splitext(original_name)
-                        safe_filename = f"{name}_{counter}{ext}"
-                        counter += 1
-                    
-                    # Save image
-                    image_path = os.path.join(agent_dir, safe_filename)
-                    with open(image_path, 'wb') as dest_file:
-                        dest_file.write(source_file.read())
-                    
-                    images_processed += 1
-                    
-                    # Limit to prevent excessive uploads
-                    if images_processed >= 5000:
-                        break
-        
-        # Reset agent's progress to start from beginning
-        progress = db.query(TaskProgress).filter(TaskProgress.agent_id == agent_id).first()
-        if progress:
-            progress.current_index = 0
-        else:
-            progress = TaskProgress(agent_id=agent_id, current_index=0)
-            db.add(progress)
-        
-        db.commit()
-        
-        return {
-            "message": "Images uploaded successfully",
-            "agent_id": agent_id,
-            "images_processed": images_processed,
-            "agent_directory": agent_dir
-        }
-        
+        return await ingest_task_zip(db, agent_id, zip_path, progress)
     except zipfile.BadZipFile:
+        progress.set_status("failed")
         raise HTTPException(status_code=400, detail="Invalid ZIP file")
     except Exception as e:
+        progress.set_status("failed")
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+    finally:
+        os.remove(zip_path)
+
+@router.get("/api/admin/upload-tasks/progress/{agent_id}")
+def get_upload_progress(agent_id: str):
+    """Progress of the latest ZIP upload for an agent"""
+    progress = get_ingest_progress(agent_id)
+    if not progress:
+        raise HTTPException(status_code=404, detail="No upload in progress for this agent")
+    return progress
+
+def _parse_filter_date(value: str, name: str, end_of_day: bool = False):
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name} format. Use YYYY-MM-DD")
+    if end_of_day:
+        # Add 23:59:59 to include the whole day
+        parsed = parsed.replace(hour=23, minute=59, second=59)
+    return parsed
+
+def submission_filters(
+    agent_id: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    area_name: Optional[str] = None,
+    crime_code: Optional[int] = None,
+    occurred_from: Optional[str] = None,
+    occurred_to: Optional[str] = None
+):
+    """Build SubmissionRecord filter criteria from the admin filters"""
+    criteria = []
+    
+    if agent_id:
+        criteria.append(SubmissionRecord.agent_id == agent_id)
+    if date_from:
+        criteria.append(SubmissionRecord.submitted_at >= _parse_filter_date(date_from, "date_from"))
+    if date_to:
+        criteria.append(SubmissionRecord.submitted_at <= _parse_filter_date(date_to, "date_to", end_of_day=True))
+    if area_name:
+        criteria.append(SubmissionRecord.AREA_NAME == area_name)
+    if crime_code is not None:
+        criteria.append(SubmissionRecord.crime_code == crime_code)
+    if occurred_from:
+        criteria.append(SubmissionRecord.occurred_at >= _parse_filter_date(occurred_from, "occurred_from"))
+    if occurred_to:
+        criteria.append(SubmissionRecord.occurred_at <= _parse_filter_date(occurred_to, "occurred_to", end_of_day=True))
+    
+    return criteria
 
 @router.get("/api/admin/export-excel")
-def export_to_excel(
+async def export_to_excel(
     agent_id: Optional[str] = None,
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
-    db: Session = Depends(get_db)
+    area_name: Optional[str] = None,
+    crime_code: Optional[int] = None,
+    occurred_from: Optional[str] = None,
+    occurred_to: Optional[str] = None,
+    format: str = "xlsx",
+    background: bool = False,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Export submitted data to Excel file"""
+    """Export submitted data as a streamed Excel, CSV or NDJSON file"""
+    
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format. Use one of: {', '.join(EXPORT_FORMATS)}")
+    
+    filters = {
+        "agent_id": agent_id, "date_from": date_from, "date_to": date_to, "area_name": area_name,
+        "crime_code": crime_code, "occurred_from": occurred_from, "occurred_to": occurred_to
+    }
+    criteria = submission_filters(**filters)
+    
+    # Cheap existence check before starting the stream
+    if await db.scalar(select(SubmissionRecord.id).where(*criteria).limit(1)) is None:
+        raise HTTPException(status_code=404, detail="No data found with current filters")
+    
+    if background:
+        job_id = await enqueue_job("export", {"filters": filters, "format": format}, max_attempts=3)
+        return JSONResponse(status_code=202, content={
+            "message": "Export queued",
+            "job_id": job_id,
+            "status_url": f"/api/admin/jobs/{job_id}"
+        })
     
+    filename = export_filename(format)
+    headers = {"Content-Disposition": f"attachment; filename={filename}"}
+    
+    # Rows are read in batches and written out chunk by chunk
+    return StreamingResponse(
+        stream_export(criteria, format),
+        media_type=EXPORT_FORMATS[format],
+        headers=headers
+    )
+
+@router.get("/api/admin/preview-data")
+async def preview_data(
+    response: Response,
+    agent_id: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    area_name: Optional[str] = None,
+    crime_code: Optional[int] = None,
+    occurred_from: Optional[str] = None,
+    occurred_to: Optional[str] = None,
+    columns: Optional[str] = None,
+    limit: int = Query(PREVIEW_DEFAULT_LIMIT, ge=1, le=PREVIEW_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """One page of submitted data with the export's filters (keyset on submitted_at, id)"""
     try:
-        # Build query
-        query = db.query(SubmittedForm)
-        
-        # Apply filters
-        if agent_id:
-            query = query.filter(SubmittedForm.agent_id == agent_id)
-        
-        if date_from:
-            try:
-                from_date = datetime.fromisoformat(date_from)
-                query = query.filter(SubmittedForm.submitted_at >= from_date)
-            except ValueError:
-                raise HTTPException(status_code=400, detail="Invalid date_from format. Use YYYY-MM-DD")
-        
-        if date_to:
-            try:
-                to_date = datetime.fromisoformat(date_to)
-                # Add 23:59:59 to include the whole day
-                to_date = to_date.replace(hour=23, minute=59, second=59)
-                query = query.filter(SubmittedForm.submitted_at <= to_date)
-            except ValueError:
-                raise HTTPException(status_code=400, detail="Invalid date_to format. Use YYYY-MM-DD")
-        
-        # Get all submissions
-        submissions = query.order_by(SubmittedForm.submitted_at.desc()).all()
-        
-        if not submissions:
-            raise HTTPException(status_code=404, detail="No data found with current filters")
-        
-        # Prepare data for Excel
-        excel_data = []
-        for submission in submissions:
-            try:
-                form_data = json.loads(submission.form_data)
-                
-                # Create row with metadata first
-                row_data = {
-                    'Submission_ID': submission.id,
-                    'Agent_ID': submission.agent_id,
-                    'Submitted_At': submission.submitted_at.strftime('%Y-%m-%d %H:%M:%S'),
-                    'Image_Name': form_data.get('image_name', 'Unknown')
-                }
-                
-                # Add all form fields
-                form_fields = [
-                    'DR_NO', 'Date_Rptd', 'DATE_OCC', 'TIME_OCC', 'Unique_Identifier',
-                    'AREA_NAME', 'Rpt_Dist_No', 'VIN', 'Crm', 'Crm_Cd_Desc', 'Mocodes',
-                    'Vict_Age', 'Geolocation', 'DEPARTMENT', 'Premis_Cd', 'Premis_Desc',
-                    'ARREST_KEY', 'PD_DESC', 'CCD_LONCOD', 'Status_Desc', 'LAW_CODE',
-                    'SubAgency', 'Charge', 'Race', 'LOCATION', 'SeqID', 'LAT', 'LON',
-                    'Point', 'Shape__Area'
-                ]
-                
-                for field in form_fields:
-                    row_data[field] = form_data.get(field, '')
-                
-                excel_data.append(row_data)
-                
-            except json.JSONDecodeError as e:
-                print(f"JSON decode error for submission {submission.id}: {e}")
-                continue
-        
-        if not excel_data:
-            raise HTTPException(status_code=404, detail="No valid data found")
-        
-        # Import pandas here to catch import errors
+        column_names = parse_columns(columns)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    criteria = submission_filters(
+        agent_id=agent_id, date_from=date_from, date_to=date_to, area_name=area_name,
+        crime_code=crime_code, occurred_from=occurred_from, occurred_to=occurred_to
+    )
+    query = preview_query(criteria, column_names)
+    if cursor:
         try:
-            import pandas as pd
-        except ImportError:
-            raise HTTPException(status_code=500, detail="pandas not installed. Run: pip install pandas")
-        
-        # Create DataFrame
-        df = pd.DataFrame(excel_data)
-        
-        # Create Excel file in memory
-        output = io.BytesIO()
-        
+            query = apply_preview_cursor(query, cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    rows = (await db.execute(query.limit(limit + 1))).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_preview_cursor(rows[-1])
+    
+    # The total only matters for the first page
+    if not cursor:
+        filtered = any((date_from, date_to, area_name, occurred_from, occurred_to)) or crime_code is not None
+        response.headers["X-Total-Estimate"] = await estimate_total(db, criteria, agent_id, filtered)
+    
+    return [preview_row(row, column_names) for row in rows]
+
+@router.get("/api/admin/search")
+async def search_submissions(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    field: Optional[str] = None,
+    agent_id: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    area_name: Optional[str] = None,
+    crime_code: Optional[int] = None,
+    occurred_from: Optional[str] = None,
+    occurred_to: Optional[str] = None,
+    limit: int = Query(SEARCH_DEFAULT_LIMIT, ge=1, le=SEARCH_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Full-text search over DR_NO, LOCATION, Crm_Cd_Desc and Mocodes with highlighted matches.
+    
+    Ranked by relevance up to SEARCH_RANK_LIMIT matches, newest first beyond it (X-Search-Order).
+    """
+    if not search_supported(db.bind.dialect.name):
+        raise HTTPException(status_code=501, detail="Full-text search needs the SQLite FTS5 index")
+    try:
+        match = build_match(q, field)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    criteria = submission_filters(
+        agent_id=agent_id, date_from=date_from, date_to=date_to, area_name=area_name,
+        crime_code=crime_code, occurred_from=occurred_from, occurred_to=occurred_to
+    )
+    # The first page decides the order; later pages follow their cursor
+    after = None
+    if cursor:
         try:
-            # Use openpyxl engine
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                df.to_excel(writer, sheet_name='Crime Records Data', index=False)
-                
-                # Auto-adjust column widths
-                workbook = writer.book
-                worksheet = writer.sheets['Crime Records Data']
-                
-                for column in worksheet.columns:
-                    max_length = 0
-                    column_letter = column[0].column_letter
-                    
-                    for cell in column:
-                        try:
-                            if cell.value and len(str(cell.value)) > max_length:
-                                max_length = len(str(cell.value))
-                        except:
-                            pass
-                    
-                    # Set width with min 10, max 50
-                    adjusted_width = min(max(max_length + 2, 10), 50)
-                    worksheet.column_dimensions[column_letter].width = adjusted_width
-        
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error creating Excel file: {str(e)}")
-        
-        output.seek(0)
-        
-        # Create filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"crime_records_export_{timestamp}.xlsx"
-        
-        # Return file as download
-        headers = {
-            "Content-Disposition": f"attachment; filename={filename}",
-            "Content-Type": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        }
-        
-        return StreamingResponse(
-            io.BytesIO(output.read()),
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers=headers
-        )
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"Unexpected error in Excel export: {e}")
-        raise HTTPException(status_code=500, detail=f"Excel export failed: {str(e)}")
-        output.seek(0)
+            after = parse_search_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        ranked = after[0] is not None
+    else:
+        total = await count_matches(db, match, criteria)
+        response.headers["X-Total-Estimate"] = format_total(total)
+        ranked = total <= SEARCH_RANK_LIMIT
+    response.headers["X-Search-Order"] = "rank" if ranked else "recent"
+    
+    query = search_query(match, criteria, ranked, after)
+    rows = (await db.execute(query.limit(limit + 1))).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_search_cursor(rows[-1])
+    
+    return [search_row(row) for row in rows]
+
+@job_handler("export")
+async def run_export_job(params: dict, context: JobContext):
+    export_format = params["format"]
+    criteria = submission_filters(**params["filters"])
+    
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    path = os.path.join(EXPORT_DIR, f"{context.job_id}.{export_format}")
+    
+    async with AsyncSessionLocal() as db:
+        total = await db.scalar(select(func.count(SubmissionRecord.id)).where(*criteria))
+    context.report(0, total)
+    
+    rows = await run_in_threadpool(write_export, criteria, export_format, path, context.report)
+    return {
+        "rows": rows,
+        "path": path,
+        "filename": export_filename(export_format),
+        "download_url": f"/api/admin/jobs/{context.job_id}/download"
+    }
+
+@router.get("/api/admin/jobs/{job_id}")
+async def get_job(job_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Status, progress, result and errors of a background job"""
+    job = await db.get(Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_status(job)
+
+@router.get("/api/admin/jobs/{job_id}/download")
+async def download_job_result(job_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Download the file produced by a completed export job"""
+    job = await db.get(Job, job_id)
+    if not job or job.kind != "export":
+        raise HTTPException(status_code=404, detail="Export job not found")
+    if job.status != "completed":
+        raise HTTPException(status_code=409, detail=f"Export is {job.status}")
+    
+    result = json.loads(job.result)
+    if not os.path.exists(result["path"]):
+        raise HTTPException(status_code=410, detail="Export file is no longer available")
+    
+    export_format = os.path.splitext(result["path"])[1].lstrip(".")
+    return FileResponse(result["path"], media_type=EXPORT_FORMATS[export_format], filename=result["filename"])
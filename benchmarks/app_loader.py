@@ -0,0 +1,31 @@
+"""Import the app the way the deployed service sees it.
+
+Every module, main.py included, imports its siblings as ``app.<module>``; in a
+checkout whose directory is not named ``app`` that package has to be registered first.
+"""
+import importlib
+import os
+import sys
+import types
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def register_package():
+    """Make ``app.<module>`` importable from the repo root"""
+    if "app" not in sys.modules:
+        package = types.ModuleType("app")
+        package.__path__ = [REPO_ROOT]
+        sys.modules["app"] = package
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+
+
+def load_app():
+    """Import main.py and return its app.
+
+    Call it after DATABASE_URL and the working directory are set: the engine and
+    the static directories are created at import time.
+    """
+    register_package()
+    return importlib.import_module("main").app
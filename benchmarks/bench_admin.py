@@ -0,0 +1,51 @@
+"""Admin dashboard reads and exports over the seeded submissions"""
+from fastapi import Response
+from app.agent_routes import get_all_agents, get_admin_statistics
+from app.database import SessionLocal
+from app.exports import stream_export
+
+
+def _call_with_session(function, **kwargs):
+    db = SessionLocal()
+    try:
+        return function(db=db, **kwargs)
+    finally:
+        db.close()
+
+
+def _drain(chunks) -> int:
+    return sum(len(chunk) for chunk in chunks)
+
+
+def bench_get_all_agents(benchmark, seeded):
+    agents = benchmark(
+        _call_with_session, get_all_agents, response=Response(), limit=None, cursor=None, fields=None
+    )
+    assert len(agents) == len(seeded["agent_ids"])
+
+
+def bench_get_admin_statistics(benchmark, seeded):
+    stats = benchmark(_call_with_session, get_admin_statistics)
+    assert stats["completed_tasks"] == seeded["submissions"]
+
+
+def bench_export_csv(benchmark, seeded):
+    assert benchmark.pedantic(lambda: _drain(stream_export([], "csv")), rounds=5, warmup_rounds=1)
+
+
+def bench_export_xlsx(benchmark, seeded):
+    assert benchmark.pedantic(lambda: _drain(stream_export([], "xlsx")), rounds=5, warmup_rounds=1)
+
+
+def bench_search_fragment(benchmark, client, seeded):
+    # A DR_NO fragment matches a few hundred records at most: ranked by relevance
+    response = benchmark(client.get, "/api/admin/search", params={"q": "12345"})
+    assert response.status_code == 200
+    assert response.headers["X-Search-Order"] == "rank"
+
+
+def bench_search_broad(benchmark, client, seeded):
+    # Every record matches; beyond the rank limit results are listed newest first
+    response = benchmark(client.get, "/api/admin/search", params={"q": "LOCATION"})
+    assert response.status_code == 200
+    assert len(response.json()) > 0
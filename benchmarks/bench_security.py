@@ -0,0 +1,19 @@
+"""bcrypt verification, the cost every login pays at least once"""
+import asyncio
+from app.security import hash_password, verify_password, verify_password_async
+
+PASSWORD = "BenchPass1"
+HASHED = hash_password(PASSWORD)
+
+
+def bench_verify_password(benchmark):
+    assert benchmark.pedantic(verify_password, args=(PASSWORD, HASHED), rounds=10)
+
+
+def bench_verify_password_async_cached(benchmark):
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(verify_password_async(PASSWORD, HASHED))
+        assert benchmark(lambda: loop.run_until_complete(verify_password_async(PASSWORD, HASHED)))
+    finally:
+        loop.close()
@@ -0,0 +1,17 @@
+"""The agent submit path through the full app (form parsing, write, next task)"""
+from app.submission_records import FORM_FIELDS
+
+FORM = {field: f"{field}-value" for field in FORM_FIELDS}
+SUBMIT_ROUNDS = 200
+
+
+def bench_submit_task_data(benchmark, client, seeded):
+    url = f"/api/agents/{seeded['busy_agent']}/submit"
+
+    def submit():
+        response = client.post(url, data=FORM)
+        assert response.status_code == 200
+        return response
+
+    # Bounded so the seeded pending tasks are never used up
+    benchmark.pedantic(submit, rounds=SUBMIT_ROUNDS, warmup_rounds=5)
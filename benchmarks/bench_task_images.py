@@ -0,0 +1,17 @@
+"""Task image lookup for an agent with a 5,000-image legacy folder"""
+from app.agent_routes import get_agent_image_files
+from app.task_manifest import invalidate_task_manifest
+
+
+def bench_get_agent_image_files_cached(benchmark, image_folder_agent):
+    get_agent_image_files(image_folder_agent)
+    images = benchmark(get_agent_image_files, image_folder_agent)
+    assert len(images) == 5000
+
+
+def bench_get_agent_image_files_cold(benchmark, image_folder_agent):
+    images = benchmark.pedantic(
+        get_agent_image_files, args=(image_folder_agent,),
+        setup=lambda: invalidate_task_manifest(image_folder_agent), rounds=50
+    )
+    assert len(images) == 5000
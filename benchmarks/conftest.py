@@ -0,0 +1,213 @@
+"""Seeded fixtures and the regression gate for the hot-path microbenchmarks.
+
+The app is imported once against a temporary SQLite database in a temporary
+working directory. Each scale in --submissions is generated from a fixed seed, so
+runs on the same machine measure the same data.
+
+Save a baseline with ``--benchmark-save=baseline``; later runs on the same machine
+are compared with the newest baseline and fail when a benchmark regressed beyond
+BENCH_REGRESSION_THRESHOLD.
+"""
+import glob
+import json
+import os
+import random
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+from pytest_benchmark.utils import get_machine_id, parse_compare_fail
+
+from app_loader import load_app
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_STORAGE = "file://./.benchmarks"
+DEFAULT_SCALES = "1000,10000,100000"
+BASELINE_NAME = "baseline"
+REGRESSION_THRESHOLD = os.environ.get("BENCH_REGRESSION_THRESHOLD", "median:25%")
+
+SEED = 20240601
+AGENT_COUNT = 200
+SESSIONS_PER_AGENT = 5
+FOLDER_IMAGES = 5000
+# Tasks left for the submit benchmark to consume
+PENDING_TASKS = 5000
+INSERT_BATCH_SIZE = 10000
+PASSWORD = "BenchPass1"
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--submissions", default=DEFAULT_SCALES,
+        help=f"Comma-separated submission counts to seed (default {DEFAULT_SCALES}; up to 1000000)"
+    )
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    # Baselines live next to the suite whatever directory pytest is run from
+    if config.getoption("benchmark_storage", None) == DEFAULT_STORAGE:
+        config.option.benchmark_storage = f"file://{os.path.join(BENCH_DIR, '.benchmarks')}"
+    _enable_regression_gate(config)
+
+    # The app creates its database and static folders relative to the working directory
+    workdir = tempfile.mkdtemp(prefix="bench_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'database.db')}"
+    os.chdir(workdir)
+    config.bench_app = load_app()
+    from app.migrations import run_migrations
+    run_migrations()
+
+
+def _enable_regression_gate(config):
+    """Compare with the newest saved baseline for this machine unless told otherwise"""
+    storage = config.getoption("benchmark_storage", None) or ""
+    if not storage.startswith("file://") or config.option.benchmark_compare or config.option.benchmark_save:
+        return
+    baselines = sorted(glob.glob(os.path.join(storage[len("file://"):], get_machine_id(), f"*_{BASELINE_NAME}.json")))
+    if not baselines:
+        return
+    config.option.benchmark_compare = baselines[-1]
+    if not config.option.benchmark_compare_fail:
+        config.option.benchmark_compare_fail = [parse_compare_fail(REGRESSION_THRESHOLD)]
+
+
+def pytest_generate_tests(metafunc):
+    if "seeded" in metafunc.fixturenames:
+        scales = [int(value) for value in metafunc.config.getoption("submissions").split(",") if value]
+        metafunc.parametrize("seeded", scales, indirect=True, scope="session", ids=[f"{n}_submissions" for n in scales])
+
+
+def _clear_tables(db):
+    from app.models import (
+        Agent, AgentSession, AgentStats, ImageAssignment, ProductivityRollup, SubmissionRecord,
+        SubmittedForm, TaskProgress
+    )
+    for model in (SubmissionRecord, SubmittedForm, ImageAssignment, TaskProgress, AgentSession,
+                  AgentStats, ProductivityRollup, Agent):
+        db.query(model).delete()
+    db.commit()
+
+
+def _form_data(rng: random.Random, index: int) -> dict:
+    from app.submission_records import FORM_FIELDS
+    form = {field: f"{field}-{rng.randint(0, 99999)}" for field in FORM_FIELDS}
+    form.update(
+        DR_NO=str(rng.randint(10**8, 10**9 - 1)),
+        Date_Rptd=f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        TIME_OCC=f"{rng.randint(0, 23):02d}{rng.randint(0, 59):02d}",
+        Crm=str(rng.randint(100, 999)),
+        Vict_Age=str(rng.randint(18, 90)),
+        LAT=f"{rng.uniform(33.7, 34.3):.4f}",
+        LON=f"{rng.uniform(-118.7, -118.1):.4f}",
+        image_name=f"record_{index:07d}.png",
+    )
+    form["DATE_OCC"] = form["Date_Rptd"]
+    return form
+
+
+def seed_database(submissions: int, seed: int = SEED) -> dict:
+    """Replace the database contents with `submissions` forms spread over AGENT_COUNT agents"""
+    from sqlalchemy import insert
+    from app.database import SessionLocal
+    from app.models import Agent, AgentSession, ImageAssignment, SubmissionRecord, SubmittedForm
+    from app.security import hash_password
+    from app.stats_counters import reconcile_stats
+    from app.submission_records import record_values
+
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    span_seconds = 90 * 24 * 3600
+    agent_ids = [f"AGT{index:06d}" for index in range(AGENT_COUNT)]
+    # One hash for everyone: seeding must not spend minutes in bcrypt
+    hashed_password = hash_password(PASSWORD)
+
+    db = SessionLocal()
+    try:
+        _clear_tables(db)
+        db.execute(insert(Agent), [
+            {"agent_id": agent_id, "name": f"Agent {index}", "email": f"agent{index}@bench.local",
+             "mobile": "5550000000", "dob": "1990-01-01", "country": "US", "gender": "Other",
+             "hashed_password": hashed_password, "status": "active", "created_at": start}
+            for index, agent_id in enumerate(agent_ids)
+        ])
+        db.execute(insert(AgentSession), [
+            {"agent_id": agent_id, "login_time": login, "logout_time": login + timedelta(hours=8),
+             "duration_minutes": 480.0}
+            for agent_id in agent_ids
+            for login in (start + timedelta(days=day) for day in range(SESSIONS_PER_AGENT))
+        ])
+
+        positions = dict.fromkeys(agent_ids, 0)
+        for batch_start in range(0, submissions, INSERT_BATCH_SIZE):
+            forms, records, assignments = [], [], []
+            for index in range(batch_start, min(batch_start + INSERT_BATCH_SIZE, submissions)):
+                agent_id = agent_ids[index % AGENT_COUNT]
+                submitted_at = start + timedelta(seconds=rng.randrange(span_seconds))
+                form = _form_data(rng, index)
+                forms.append({"id": index + 1, "agent_id": agent_id, "form_data": json.dumps(form),
+                              "submitted_at": submitted_at})
+                records.append(record_values(index + 1, agent_id, submitted_at, form))
+                assignments.append({"agent_id": agent_id, "position": positions[agent_id],
+                                    "image_filename": form["image_name"],
+                                    "image_path": f"static/blobs/00/{index:064d}.png",
+                                    "assigned_at": start, "completed_at": submitted_at,
+                                    "is_completed": "completed"})
+                positions[agent_id] += 1
+            db.execute(insert(SubmittedForm), forms)
+            db.execute(insert(SubmissionRecord), records)
+            db.execute(insert(ImageAssignment), assignments)
+
+        # Work still queued for the agent the submit benchmark uses
+        busy_agent = agent_ids[0]
+        db.execute(insert(ImageAssignment), [
+            {"agent_id": busy_agent, "position": positions[busy_agent] + offset,
+             "image_filename": f"pending_{offset:05d}.png",
+             "image_path": f"static/blobs/ff/{offset:064d}.png", "assigned_at": start, "is_completed": "pending"}
+            for offset in range(PENDING_TASKS)
+        ])
+        db.commit()
+        reconcile_stats(db)
+    finally:
+        db.close()
+
+    return {"submissions": submissions, "agent_ids": agent_ids, "busy_agent": busy_agent}
+
+
+def seed_image_folder(agent_id: str, count: int = FOLDER_IMAGES) -> str:
+    """A legacy per-agent folder holding `count` small PNG files"""
+    from app.task_manifest import agent_folder
+    folder = agent_folder(agent_id)
+    os.makedirs(folder, exist_ok=True)
+    png = bytes.fromhex(
+        "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+        "1f15c4890000000d49444154789c6360000002000001e221bc330000000049454e44ae426082"
+    )
+    for index in range(count):
+        with open(os.path.join(folder, f"record_{index + 1:05d}.png"), "wb") as image_file:
+            image_file.write(png)
+    return folder
+
+
+@pytest.fixture(scope="session")
+def app(request):
+    return request.config.bench_app
+
+
+@pytest.fixture(scope="session")
+def client(app):
+    from fastapi.testclient import TestClient
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def seeded(request):
+    return seed_database(request.param)
+
+
+@pytest.fixture(scope="session")
+def image_folder_agent():
+    agent_id = "AGT_FOLDER"
+    seed_image_folder(agent_id)
+    return agent_id
@@ -0,0 +1,400 @@
+"""Simulate a shift of concurrent agents (plus admin traffic) against the API.
+
+Starts main.py on a temporary SQLite database unless --base-url is given, registers
+synthetic agents, uploads a ZIP of generated task images to each, then runs every
+agent through login -> current-task -> image fetch -> submit ... -> logout while
+admin clients poll the dashboard and pull exports. Prints a JSON report with
+throughput and p50/p95/p99 latency per route.
+
+    python benchmarks/loadtest.py --agents 50 --tasks 20 --output run.json
+    python benchmarks/loadtest.py --compare run.json
+"""
+import argparse
+import asyncio
+import io
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from collections import defaultdict
+from datetime import datetime
+
+import httpx
+from PIL import Image, ImageDraw
+
+from app_loader import REPO_ROOT, register_package
+
+register_package()
+from app.submission_records import FORM_FIELDS  # noqa: E402
+
+SERVE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "serve.py")
+STARTUP_TIMEOUT = 60
+IMAGE_SIZE = (850, 1100)  # a scanned letter-size page at 100 dpi
+ACCEPT_IMAGES = "image/avif,image/webp,image/png,image/*;q=0.8"
+
+
+class LatencyRecorder:
+    """Per-route latency samples and error counts"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def request(self, client: httpx.AsyncClient, route: str, method: str, url: str,
+                      allowed_statuses: tuple = (), **kwargs):
+        """Time one request, including reading the whole body; labelled by route template"""
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.samples[route].append(time.perf_counter() - started)
+            self.errors[route] += 1
+            return None
+        self.samples[route].append(time.perf_counter() - started)
+        if response.status_code >= 400 and response.status_code not in allowed_statuses:
+            self.errors[route] += 1
+        return response
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def route_summary(samples: list, errors: int, duration: float) -> dict:
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "errors": errors,
+        "throughput_rps": round(len(ordered) / duration, 2) if duration else 0.0,
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2) if ordered else 0.0,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Synthetic data
+# ---------------------------------------------------------------------------
+
+def scanned_page(rng: random.Random) -> bytes:
+    """A PNG that compresses like a scanned form: white page, boxes and text lines"""
+    image = Image.new("L", IMAGE_SIZE, 255)
+    draw = ImageDraw.Draw(image)
+    for top in range(60, IMAGE_SIZE[1] - 60, 45):
+        if rng.random() < 0.3:
+            draw.rectangle([50, top, IMAGE_SIZE[0] - 50, top + 35], outline=0, width=2)
+        words_end = rng.randint(200, IMAGE_SIZE[0] - 60)
+        x = 60
+        while x < words_end:
+            width = rng.randint(20, 90)
+            draw.rectangle([x, top + 12, x + width, top + 22], fill=rng.randint(0, 80))
+            x += width + rng.randint(8, 16)
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def task_zip(count: int, seed: int) -> bytes:
+    rng = random.Random(seed)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+        for index in range(count):
+            archive.writestr(f"record_{index + 1:05d}.png", scanned_page(rng))
+    return buffer.getvalue()
+
+
+def form_fields(rng: random.Random, sequence: int) -> dict:
+    fields = {field: f"{field}-{rng.randint(0, 99999)}" for field in FORM_FIELDS}
+    fields["DR_NO"] = f"{rng.randint(10**8, 10**9 - 1)}"
+    fields["Date_Rptd"] = f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+    fields["DATE_OCC"] = fields["Date_Rptd"]
+    fields["TIME_OCC"] = f"{rng.randint(0, 23):02d}{rng.randint(0, 59):02d}"
+    fields["Crm"] = str(rng.randint(100, 999))
+    fields["SeqID"] = str(sequence)
+    return fields
+
+
+async def register_agents(client: httpx.AsyncClient, count: int) -> list:
+    agents = []
+    for index in range(count):
+        response = await client.post("/api/agents/register", data={
+            "name": f"Load Agent {index}",
+            "email": f"load{index}@example.com",
+            "mobile": f"555{index:07d}",
+            "dob": "1990-01-01",
+            "country": "US",
+            "gender": "Other",
+        })
+        response.raise_for_status()
+        credentials = response.json()
+        agents.append({"agent_id": credentials["agent_id"], "password": credentials["password"]})
+    return agents
+
+
+async def upload_tasks(client: httpx.AsyncClient, agents: list, tasks: int, concurrency: int):
+    """One generated ZIP per agent, uploaded a few at a time"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def upload(index: int, agent: dict):
+        archive = await asyncio.to_thread(task_zip, tasks, index)
+        async with semaphore:
+            response = await client.post(
+                "/api/admin/upload-tasks",
+                data={"agent_id": agent["agent_id"]},
+                files={"zip_file": (f"batch_{index}.zip", archive, "application/zip")},
+            )
+        response.raise_for_status()
+
+    await asyncio.gather(*(upload(index, agent) for index, agent in enumerate(agents)))
+
+
+# ---------------------------------------------------------------------------
+# Traffic
+# ---------------------------------------------------------------------------
+
+async def agent_shift(client: httpx.AsyncClient, recorder: LatencyRecorder, agent: dict,
+                      submissions: int, think_time: float, rng: random.Random):
+    agent_id = agent["agent_id"]
+    response = await recorder.request(client, "POST /api/agents/login", "POST", "/api/agents/login",
+                                      data={"agent_id": agent_id, "password": agent["password"]})
+    if response is None or response.status_code != 200:
+        return
+
+    for sequence in range(submissions):
+        response = await recorder.request(client, "GET /api/agents/{agent_id}/current-task", "GET",
+                                          f"/api/agents/{agent_id}/current-task",
+                                          headers={"Accept": ACCEPT_IMAGES})
+        if response is None or response.status_code != 200:
+            break
+        task = response.json()
+        if task.get("completed"):
+            break
+
+        await recorder.request(client, "GET /static (task image)", "GET", task["image_url"],
+                               headers={"Accept": ACCEPT_IMAGES})
+        if think_time:
+            await asyncio.sleep(rng.uniform(0.5, 1.5) * think_time)
+
+        await recorder.request(client, "POST /api/agents/{agent_id}/submit", "POST",
+                               f"/api/agents/{agent_id}/submit", data=form_fields(rng, sequence))
+
+    await recorder.request(client, "POST /api/agents/{agent_id}/logout", "POST",
+                           f"/api/agents/{agent_id}/logout")
+
+
+async def admin_dashboard(client: httpx.AsyncClient, recorder: LatencyRecorder, stop: asyncio.Event,
+                          interval: float, export_every: int, export_format: str):
+    """What an open admin tab does: poll the dashboard, occasionally preview and export"""
+    rounds = 0
+    while not stop.is_set():
+        await recorder.request(client, "GET /api/admin/statistics", "GET", "/api/admin/statistics")
+        await recorder.request(client, "GET /api/agents", "GET", "/api/agents")
+        await recorder.request(client, "GET /api/admin/preview-data", "GET", "/api/admin/preview-data")
+        rounds += 1
+        if export_every and rounds % export_every == 0:
+            # 404 just means nothing has been submitted yet
+            await recorder.request(client, "GET /api/admin/export-excel", "GET", "/api/admin/export-excel",
+                                   allowed_statuses=(404,), params={"format": export_format})
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+# ---------------------------------------------------------------------------
+# Server
+# ---------------------------------------------------------------------------
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def start_server(workdir: str, port: int) -> subprocess.Popen:
+    """main.py under uvicorn with its database, static files and pages in workdir"""
+    for page in ("admin.html", "agent.html"):
+        shutil.copy(os.path.join(REPO_ROOT, page), workdir)
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'database.db')}")
+    log = open(os.path.join(workdir, "server.log"), "wb")
+    return subprocess.Popen(
+        [sys.executable, SERVE_SCRIPT, "--port", str(port)],
+        cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+
+
+async def wait_until_healthy(client: httpx.AsyncClient, server: subprocess.Popen = None):
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if server is not None and server.poll() is not None:
+            raise RuntimeError("Server exited during startup; see server.log in the work directory")
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server not healthy after {STARTUP_TIMEOUT}s")
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+# ---------------------------------------------------------------------------
+# Run and report
+# ---------------------------------------------------------------------------
+
+async def run(args) -> dict:
+    started_at = datetime.utcnow().isoformat()
+    limits = httpx.Limits(max_connections=args.agents + args.admins + 4, max_keepalive_connections=args.agents + args.admins)
+    timeout = httpx.Timeout(args.request_timeout)
+    server = None
+    workdir = None
+    base_url = args.base_url
+    if not base_url:
+        workdir = tempfile.mkdtemp(prefix="loadtest_")
+        port = free_port()
+        server = start_server(workdir, port)
+        base_url = f"http://127.0.0.1:{port}"
+
+    try:
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+            await wait_until_healthy(client, server)
+
+            setup_started = time.perf_counter()
+            agents = await register_agents(client, args.agents)
+            await upload_tasks(client, agents, args.tasks, args.upload_concurrency)
+            setup_seconds = time.perf_counter() - setup_started
+
+            recorder = LatencyRecorder()
+            stop = asyncio.Event()
+            rng = random.Random(args.seed)
+            admins = [
+                asyncio.create_task(admin_dashboard(
+                    client, recorder, stop, args.admin_interval, args.export_every, args.export_format
+                ))
+                for _ in range(args.admins)
+            ]
+
+            started = time.perf_counter()
+            await asyncio.gather(*(
+                agent_shift(client, recorder, agent, args.tasks, args.think_time, random.Random(rng.random()))
+                for agent in agents
+            ))
+            duration = time.perf_counter() - started
+            stop.set()
+            await asyncio.gather(*admins)
+
+            metrics = (await client.get("/metrics")).text if args.scrape_metrics else None
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+        if workdir and not args.keep_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    total = sum(len(samples) for samples in recorder.samples.values())
+    report = {
+        "meta": {
+            "started_at": started_at,
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "base_url": args.base_url or "spawned",
+            "config": {
+                "agents": args.agents, "tasks": args.tasks, "admins": args.admins,
+                "think_time": args.think_time, "admin_interval": args.admin_interval,
+                "export_every": args.export_every, "export_format": args.export_format, "seed": args.seed,
+            },
+        },
+        "setup_seconds": round(setup_seconds, 2),
+        "duration_seconds": round(duration, 3),
+        "total_requests": total,
+        "total_errors": sum(recorder.errors.values()),
+        "throughput_rps": round(total / duration, 2) if duration else 0.0,
+        "routes": {
+            route: route_summary(recorder.samples[route], recorder.errors[route], duration)
+            for route in sorted(recorder.samples)
+        },
+    }
+    if metrics is not None:
+        report["server_metrics"] = metrics
+    return report
+
+
+def print_table(report: dict, baseline: dict = None, stream=sys.stderr):
+    print(f"\n{report['total_requests']} requests in {report['duration_seconds']}s "
+          f"({report['throughput_rps']} req/s, {report['total_errors']} errors)", file=stream)
+    header = f"{'route':<44} {'count':>7} {'err':>5} {'rps':>8} {'p50':>9} {'p95':>9} {'p99':>9}"
+    if baseline:
+        header += f" {'p95 vs base':>12}"
+    print(header, file=stream)
+    for route, summary in report["routes"].items():
+        line = (f"{route:<44} {summary['count']:>7} {summary['errors']:>5} {summary['throughput_rps']:>8} "
+                f"{summary['p50_ms']:>9} {summary['p95_ms']:>9} {summary['p99_ms']:>9}")
+        previous = (baseline or {}).get("routes", {}).get(route)
+        if previous and previous["p95_ms"]:
+            line += f" {(summary['p95_ms'] / previous['p95_ms'] - 1) * 100:>+11.1f}%"
+        print(line, file=stream)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", help="Target a running deployment instead of spawning one")
+    parser.add_argument("--agents", type=int, default=20, help="Concurrent agents on shift")
+    parser.add_argument("--tasks", type=int, default=10, help="Images per agent; each agent submits them all")
+    parser.add_argument("--admins", type=int, default=2, help="Concurrent admin dashboard tabs")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean seconds an agent spends per form")
+    parser.add_argument("--admin-interval", type=float, default=1.0, help="Seconds between dashboard polls")
+    parser.add_argument("--export-every", type=int, default=5, help="Export once every N dashboard polls (0 = never)")
+    parser.add_argument("--export-format", default="xlsx", choices=["xlsx", "csv", "ndjson"])
+    parser.add_argument("--upload-concurrency", type=int, default=4)
+    parser.add_argument("--request-timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--scrape-metrics", action="store_true", help="Include the server's /metrics text in the report")
+    parser.add_argument("--keep-workdir", action="store_true", help="Keep the temp database and server log")
+    parser.add_argument("--output", help="Write the JSON report here (default: stdout)")
+    parser.add_argument("--compare", help="Earlier JSON report to compare p95 latencies against")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+    print_table(report, baseline)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+"""Run main.app under uvicorn in the current directory (started by loadtest.py)"""
+import argparse
+import uvicorn
+from app_loader import load_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    args = parser.parse_args()
+    uvicorn.run(load_app(), host=args.host, port=args.port, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
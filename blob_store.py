@@ -0,0 +1,151 @@
+import hashlib
+import os
+import tempfile
+import zlib
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from app.database import upsert_insert
+from app.models import ImageBlob, ImageAssignment
+from app.task_manifest import TASK_IMAGES_ROOT, FALLBACK_FOLDER
+
+# Task images live once under static/blobs/<first two hex chars>/<sha256><ext>
+BLOB_ROOT = os.environ.get("BLOB_ROOT", "static/blobs")
+HASH_BUFFER_SIZE = 1024 * 1024
+LOOKUP_CHUNK_SIZE = 500
+
+
+def blob_path(digest: str, extension: str) -> str:
+    return f"{BLOB_ROOT}/{digest[:2]}/{digest}{extension.lower()}"
+
+
+def is_blob_path(path: str) -> bool:
+    return path.startswith(f"{BLOB_ROOT}/")
+
+
+def store_stream(source, extension: str):
+    """Copy a stream into the store while hashing it; returns (digest, path, size, crc32).
+
+    Content that is already stored is discarded, so identical files cost one copy on disk.
+    """
+    os.makedirs(BLOB_ROOT, exist_ok=True)
+    hasher = hashlib.sha256()
+    crc = 0
+    size = 0
+
+    handle, temp_path = tempfile.mkstemp(dir=BLOB_ROOT, suffix=".part")
+    try:
+        with os.fdopen(handle, "wb") as destination:
+            while True:
+                chunk = source.read(HASH_BUFFER_SIZE)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                crc = zlib.crc32(chunk, crc)
+                size += len(chunk)
+                destination.write(chunk)
+
+        digest = hasher.hexdigest()
+        path = blob_path(digest, extension)
+        if os.path.exists(path):
+            os.remove(temp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return digest, path, size, crc
+
+
+def hash_stream(source) -> str:
+    """sha256 of a stream, read in chunks without storing it"""
+    hasher = hashlib.sha256()
+    while True:
+        chunk = source.read(HASH_BUFFER_SIZE)
+        if not chunk:
+            break
+        hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def find_known_blobs(db: Session, keys: set) -> dict:
+    """Map (crc32, size) keys to the already-stored blobs with that key whose file is still on disk.
+
+    CRC32 collisions are easy to forge, so these are only candidates: a blob may be
+    reused for new content only once its sha256 digest matches.
+    """
+    known = {}
+    crcs = sorted({crc for crc, _ in keys})
+    for start in range(0, len(crcs), LOOKUP_CHUNK_SIZE):
+        rows = db.query(ImageBlob.digest, ImageBlob.path, ImageBlob.size, ImageBlob.crc32).filter(
+            ImageBlob.crc32.in_(crcs[start:start + LOOKUP_CHUNK_SIZE])
+        ).all()
+        for row in rows:
+            key = (row.crc32, row.size)
+            if key in keys and os.path.exists(row.path):
+                known.setdefault(key, []).append(row)
+    return known
+
+
+def register_blobs(db: Session, blobs: list):
+    """Record newly stored blobs (dicts with digest/path/size/crc32), ignoring ones already known.
+
+    Concurrent ingests of the same files race to register the same digests, so the
+    insert skips conflicting rows instead of relying on the lookup beforehand.
+    """
+    if not blobs:
+        return 0
+
+    unique = {blob["digest"]: blob for blob in blobs}
+    upsert = upsert_insert(db.get_bind().dialect.name)
+    if upsert is not None:
+        return db.connection().execute(
+            upsert(ImageBlob.__table__).on_conflict_do_nothing(index_elements=["digest"]), list(unique.values())
+        ).rowcount
+
+    existing = set()
+    digests = list(unique)
+    for start in range(0, len(digests), LOOKUP_CHUNK_SIZE):
+        existing.update(digest for (digest,) in db.query(ImageBlob.digest).filter(
+            ImageBlob.digest.in_(digests[start:start + LOOKUP_CHUNK_SIZE])
+        ))
+
+    rows = [blob for digest, blob in unique.items() if digest not in existing]
+    if rows:
+        db.execute(insert(ImageBlob), rows)
+    return len(rows)
+
+
+def deduplicate_agent_folders(db: Session, on_progress=None) -> dict:
+    """Move assigned images out of per-agent folders into the blob store.
+
+    Assignments are repointed at the shared blob and the per-agent copy is removed once
+    nothing references it. The shared fallback folder is left alone because agents
+    without assignments are still seeded from it.
+    """
+    fallback_prefix = f"{TASK_IMAGES_ROOT}/{FALLBACK_FOLDER}/"
+    paths = [
+        path for (path,) in db.query(ImageAssignment.image_path).distinct()
+        if not is_blob_path(path) and not path.startswith(fallback_prefix)
+    ]
+
+    stored = []
+    moved = 0
+    for index, path in enumerate(paths, start=1):
+        if os.path.exists(path):
+            with open(path, "rb") as source:
+                digest, target, size, crc = store_stream(source, os.path.splitext(path)[1])
+            stored.append({"digest": digest, "path": target, "size": size, "crc32": crc})
+
+            db.query(ImageAssignment).filter(ImageAssignment.image_path == path).update(
+                {ImageAssignment.image_path: target}, synchronize_session=False
+            )
+            register_blobs(db, stored[-1:])
+            db.commit()
+            os.remove(path)
+            moved += 1
+        if on_progress:
+            on_progress(index, len(paths))
+
+    return {"files_moved": moved, "blobs": len({blob["digest"] for blob in stored})}
@@ -1,17 +1,108 @@
-from sqlalchemy import create_engine
+import os
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 # SQLite database URL - will create database.db in backend directory
-SQLALCHEMY_DATABASE_URL = "sqlite:///./database.db"
+SQLALCHEMY_DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./database.db")
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, 
-    connect_args={"check_same_thread": False}
-)
+# Async drivers for the same database (aiosqlite locally, asyncpg on Postgres)
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+def async_database_url(url: str) -> str:
+    """Swap the sync driver in a database URL for its async counterpart"""
+    scheme, rest = url.split("://", 1)
+    dialect = scheme.split("+", 1)[0]
+    return f"{ASYNC_DRIVERS.get(dialect, scheme)}://{rest}"
+
+def upsert_insert(dialect_name: str):
+    """insert() with ON CONFLICT support, imported on first use (the postgresql dialect is slow to import)"""
+    if dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        return dialect_insert
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        return dialect_insert
+    return None
+
+# Pool sizing, shared by the sync and async engines
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+
+# Applied to every new SQLite connection: WAL lets readers run alongside the writer,
+# busy_timeout waits for the write lock instead of failing with "database is locked"
+SQLITE_PRAGMAS = {
+    "journal_mode": os.environ.get("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "mmap_size": int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": int(os.environ.get("SQLITE_CACHE_SIZE", "-64000")),  # negative = KiB
+    "temp_store": "MEMORY",
+}
+
+def _is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+def _is_memory_sqlite(url: str) -> bool:
+    return _is_sqlite(url) and (":memory:" in url or url.rstrip("/").endswith("sqlite:"))
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+def _engine_options(url: str, pool_class) -> dict:
+    if _is_memory_sqlite(url):
+        return {"connect_args": {"check_same_thread": False}}
+    options = {
+        "poolclass": pool_class,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+    }
+    if _is_sqlite(url):
+        options["connect_args"] = {
+            "check_same_thread": False,
+            "timeout": SQLITE_PRAGMAS["busy_timeout"] / 1000,
+        }
+    else:
+        options["pool_pre_ping"] = True
+    return options
+
+def create_db_engine(url: str = SQLALCHEMY_DATABASE_URL, **overrides):
+    """Sync engine with a sized pool and SQLite pragmas applied on connect"""
+    options = _engine_options(url, QueuePool)
+    options.update(overrides)
+    db_engine = create_engine(url, **options)
+    if _is_sqlite(url):
+        event.listen(db_engine, "connect", apply_sqlite_pragmas)
+    return db_engine
+
+def create_async_db_engine(url: str = SQLALCHEMY_DATABASE_URL, **overrides):
+    """Async engine for the same database, tuned the same way"""
+    options = _engine_options(url, AsyncAdaptedQueuePool)
+    options.update(overrides)
+    db_engine = create_async_engine(async_database_url(url), **options)
+    if _is_sqlite(url):
+        event.listen(db_engine.sync_engine, "connect", apply_sqlite_pragmas)
+    return db_engine
+
+engine = create_db_engine()
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_db_engine()
+
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 def get_db():
@@ -21,3 +112,23 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    """Dependency to get an async database session"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def sync_schema(bind):
+    """Add columns and indexes that create_all skips on tables which already exist"""
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing_columns:
+                    column_type = column.type.compile(dialect=bind.dialect)
+                    conn.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}')
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
@@ -0,0 +1,172 @@
+import csv
+import io
+import json
+import os
+import tempfile
+from datetime import datetime
+from app.database import SessionLocal
+from app.models import SubmissionRecord
+from app.submission_records import FORM_FIELDS
+
+EXPORT_COLUMNS = ['Submission_ID', 'Agent_ID', 'Submitted_At', 'Image_Name'] + FORM_FIELDS
+
+EXPORT_FORMATS = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+# Where background export jobs leave their files
+EXPORT_DIR = os.environ.get("EXPORT_DIR", "exports")
+
+EXPORT_BATCH_SIZE = 1000
+WIDTH_SAMPLE_ROWS = 200
+CHUNK_SIZE = 64 * 1024
+
+
+def iter_export_rows(criteria: list, batch_size: int = EXPORT_BATCH_SIZE):
+    """Yield export rows (lists in EXPORT_COLUMNS order) reading typed records in batches"""
+    columns = [
+        SubmissionRecord.submission_id,
+        SubmissionRecord.agent_id,
+        SubmissionRecord.submitted_at,
+        SubmissionRecord.image_name,
+    ] + [getattr(SubmissionRecord, field) for field in FORM_FIELDS]
+
+    db = SessionLocal()
+    try:
+        query = db.query(*columns).filter(*criteria).order_by(
+            SubmissionRecord.submitted_at.desc()
+        ).yield_per(batch_size)
+
+        for record in query:
+            row = [
+                record[0],
+                record[1],
+                record[2].strftime('%Y-%m-%d %H:%M:%S') if record[2] else '',
+                record[3] or 'Unknown'
+            ]
+            row.extend(value if value is not None else '' for value in record[4:])
+            yield row
+    finally:
+        db.close()
+
+
+def stream_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+def stream_ndjson(rows):
+    chunk = []
+    size = 0
+    for row in rows:
+        line = json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=str) + "\n"
+        chunk.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield "".join(chunk).encode("utf-8")
+            chunk = []
+            size = 0
+    if chunk:
+        yield "".join(chunk).encode("utf-8")
+
+
+def _estimate_widths(sample: list):
+    """Column widths from a sample of rows (min 10, max 50) instead of scanning every cell"""
+    widths = []
+    for index, header in enumerate(EXPORT_COLUMNS):
+        longest = max([len(header)] + [len(str(row[index])) for row in sample if row[index] is not None])
+        widths.append(min(max(longest + 2, 10), 50))
+    return widths
+
+
+def write_xlsx(rows, destination):
+    """Write rows into a write-only workbook so memory stays flat regardless of row count"""
+    from openpyxl import Workbook
+    from openpyxl.utils import get_column_letter
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet('Crime Records Data')
+
+    sample = []
+    for row in rows:
+        sample.append(row)
+        if len(sample) >= WIDTH_SAMPLE_ROWS:
+            break
+
+    # Column widths must be set before the first row in write-only mode
+    for index, width in enumerate(_estimate_widths(sample), start=1):
+        worksheet.column_dimensions[get_column_letter(index)].width = width
+
+    worksheet.append(EXPORT_COLUMNS)
+    for row in sample:
+        worksheet.append(row)
+    for row in rows:
+        worksheet.append(row)
+
+    workbook.save(destination)
+
+
+def stream_xlsx(rows):
+    """Build the workbook in a temp file and stream it out chunk by chunk"""
+    handle, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(handle)
+    try:
+        write_xlsx(rows, path)
+        with open(path, "rb") as workbook_file:
+            while True:
+                chunk = workbook_file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.remove(path)
+
+
+def stream_export(criteria: list, export_format: str = "xlsx"):
+    rows = iter_export_rows(criteria)
+    if export_format == "csv":
+        return stream_csv(rows)
+    if export_format == "ndjson":
+        return stream_ndjson(rows)
+    return stream_xlsx(rows)
+
+
+def write_export(criteria: list, export_format: str, destination: str, on_progress=None) -> int:
+    """Write an export straight to a file (used by background jobs); returns the row count"""
+    written = 0
+
+    def counted(rows):
+        nonlocal written
+        for row in rows:
+            written += 1
+            if on_progress and written % EXPORT_BATCH_SIZE == 0:
+                on_progress(written)
+            yield row
+
+    rows = counted(iter_export_rows(criteria))
+    if export_format == "xlsx":
+        write_xlsx(rows, destination)
+    else:
+        chunks = stream_csv(rows) if export_format == "csv" else stream_ndjson(rows)
+        with open(destination, "wb") as export_file:
+            for chunk in chunks:
+                export_file.write(chunk)
+
+    if on_progress:
+        on_progress(written)
+    return written
+
+
+def export_filename(export_format: str = "xlsx") -> str:
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"crime_records_export_{timestamp}.{export_format}"
@@ -0,0 +1,94 @@
+import asyncio
+import os
+from app.database import AsyncSessionLocal
+
+# Off by default; set DB_GROUP_COMMIT=1 to batch submissions from many requests per transaction
+GROUP_COMMIT_ENABLED = os.environ.get("DB_GROUP_COMMIT", "0") == "1"
+GROUP_COMMIT_MAX_BATCH = int(os.environ.get("DB_GROUP_COMMIT_MAX_BATCH", "50"))
+GROUP_COMMIT_MAX_DELAY = float(os.environ.get("DB_GROUP_COMMIT_MAX_DELAY_MS", "10")) / 1000
+
+
+class GroupCommitWriter:
+    """Runs units of work from concurrent requests in one shared transaction.
+
+    Each unit is an async callable taking the batch session. It must flush its own
+    changes and must not commit. If any unit in a batch fails, the batch is rolled
+    back and every unit is retried in its own transaction, so one bad request never
+    fails its neighbours.
+    """
+
+    def __init__(self, session_factory, max_batch: int = GROUP_COMMIT_MAX_BATCH, max_delay: float = GROUP_COMMIT_MAX_DELAY):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue = None
+        self._worker = None
+        self.batches_committed = 0
+
+    async def submit(self, work):
+        """Queue a unit of work and wait for its result once its batch commits"""
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((work, future))
+        return await future
+
+    async def close(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._flush(batch)
+
+    async def _flush(self, batch):
+        async with self.session_factory() as session:
+            try:
+                results = [await work(session) for work, _ in batch]
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                results = None
+
+        if results is not None:
+            self.batches_committed += 1
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+            return
+
+        # Retry one by one so only the failing request sees its error
+        for work, future in batch:
+            async with self.session_factory() as session:
+                try:
+                    result = await work(session)
+                    await session.commit()
+                except Exception as e:
+                    await session.rollback()
+                    if not future.done():
+                        future.set_exception(e)
+                    continue
+            if not future.done():
+                future.set_result(result)
+
+
+# Shared writer for agent submissions
+submission_writer = GroupCommitWriter(AsyncSessionLocal)
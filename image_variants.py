@@ -0,0 +1,155 @@
+import asyncio
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+# Compressed derivatives written next to each original:
+#   <name>.webp        full-size WebP
+#   <name>.avif        full-size AVIF (only when Pillow has AVIF support)
+#   <name>.thumb.webp  small WebP preview
+WEBP_QUALITY = int(os.environ.get("WEBP_QUALITY", "85"))
+AVIF_QUALITY = int(os.environ.get("AVIF_QUALITY", "60"))
+THUMBNAIL_WIDTH = int(os.environ.get("THUMBNAIL_WIDTH", "480"))
+IMAGE_WORKERS = int(os.environ.get("IMAGE_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+VARIANT_CHUNK_SIZE = 32
+
+_process_pool = None
+
+
+def variant_paths(image_path: str) -> dict:
+    stem = os.path.splitext(image_path)[0]
+    return {
+        "avif": f"{stem}.avif",
+        "webp": f"{stem}.webp",
+        "thumbnail": f"{stem}.thumb.webp",
+    }
+
+
+def _is_fresh(variant: str, source_mtime: float) -> bool:
+    try:
+        return os.stat(variant).st_mtime >= source_mtime
+    except OSError:
+        return False
+
+
+def _save_atomic(image, path: str, image_format: str, **params):
+    """Write to a temp file beside path, then rename it into place.
+
+    Readers pick variants by existence, size and mtime, so a half-written file (or one
+    left by a killed worker) must never appear under the final name.
+    """
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".part")
+    try:
+        with os.fdopen(handle, "wb") as destination:
+            image.save(destination, image_format, **params)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def generate_variants(image_path: str) -> int:
+    """Write WebP/AVIF/thumbnail variants for one image; runs in a worker process"""
+    from PIL import Image, features
+
+    targets = variant_paths(image_path)
+    source_mtime = os.stat(image_path).st_mtime
+    created = 0
+
+    with Image.open(image_path) as original:
+        image = original.convert("RGBA" if original.mode in ("RGBA", "LA", "P") else "RGB")
+
+        if not _is_fresh(targets["webp"], source_mtime):
+            _save_atomic(image, targets["webp"], "WEBP", quality=WEBP_QUALITY, method=4)
+            created += 1
+
+        if features.check("avif") and not _is_fresh(targets["avif"], source_mtime):
+            _save_atomic(image, targets["avif"], "AVIF", quality=AVIF_QUALITY)
+            created += 1
+
+        if not _is_fresh(targets["thumbnail"], source_mtime):
+            thumbnail = image.copy()
+            thumbnail.thumbnail((THUMBNAIL_WIDTH, THUMBNAIL_WIDTH * 4))
+            _save_atomic(thumbnail, targets["thumbnail"], "WEBP", quality=WEBP_QUALITY, method=4)
+            created += 1
+
+    return created
+
+
+def _safe_generate(image_path: str) -> int:
+    try:
+        return generate_variants(image_path)
+    except Exception as e:
+        print(f"Variant generation failed for {image_path}: {e}")
+        return 0
+
+
+def _pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+    return _process_pool
+
+
+async def build_variants(image_paths: list, on_progress=None) -> int:
+    """Generate variants for many images on the process pool, chunk by chunk"""
+    loop = asyncio.get_running_loop()
+    created = 0
+    for start in range(0, len(image_paths), VARIANT_CHUNK_SIZE * IMAGE_WORKERS):
+        batch = image_paths[start:start + VARIANT_CHUNK_SIZE * IMAGE_WORKERS]
+        results = await asyncio.gather(*[
+            loop.run_in_executor(_pool(), _safe_generate, path) for path in batch
+        ])
+        created += sum(results)
+        if on_progress:
+            on_progress(start + len(batch), len(image_paths))
+    return created
+
+
+def accepted_formats(accept_header: str = "", formats: str = "") -> set:
+    """Image formats a client can display, from its Accept header and/or a formats=webp,avif hint"""
+    accepted = {name.strip().lower() for name in (formats or "").split(",") if name.strip()}
+    for name in ("avif", "webp"):
+        if f"image/{name}" in (accept_header or ""):
+            accepted.add(name)
+    return accepted
+
+
+def needs_variants(image_path: str) -> bool:
+    try:
+        source_mtime = os.stat(image_path).st_mtime
+    except OSError:
+        return False
+    targets = variant_paths(image_path)
+    return not (_is_fresh(targets["webp"], source_mtime) and _is_fresh(targets["thumbnail"], source_mtime))
+
+
+def best_variant(image_path: str, formats: set) -> str:
+    """Smallest accepted variant on disk, else the original (dense scans can compress worse than PNG)"""
+    targets = variant_paths(image_path)
+    best, best_size = image_path, None
+    for name in ("avif", "webp"):
+        if name not in formats:
+            continue
+        try:
+            size = os.path.getsize(targets[name])
+            if best_size is None:
+                best_size = os.path.getsize(image_path)
+        except OSError:
+            continue
+        if size < best_size:
+            best, best_size = targets[name], size
+    return best
+
+
+def thumbnail_for(image_path: str):
+    thumbnail = variant_paths(image_path)["thumbnail"]
+    return thumbnail if os.path.exists(thumbnail) else None
+
+
+def shutdown_pool():
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
@@ -0,0 +1,190 @@
+import asyncio
+import bisect
+import contextvars
+import os
+import threading
+import time
+from sqlalchemy import event
+from app.database import engine, async_engine
+from app.security import bcrypt_queue_depth
+
+# Histogram bucket bounds (seconds / counts), in the Prometheus "le" convention
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+LOOP_LAG_INTERVAL = float(os.environ.get("LOOP_LAG_INTERVAL", "0.5"))
+
+_lock = threading.Lock()
+
+
+def _label_text(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{str(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name, self.help_text, self.labels = name, help_text, labels
+        self.values = {}
+
+    def inc(self, *label_values, amount: float = 1):
+        with _lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} counter"
+        for label_values, value in sorted(self.values.items()):
+            yield f"{self.name}{_label_text(self.labels, label_values)} {value}"
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name, self.help_text, self.labels, self.buckets = name, help_text, labels, buckets
+        self.series = {}  # label values -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} histogram"
+        for label_values, series in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                labels = _label_text(self.labels + ("le",), label_values + (bound,))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _label_text(self.labels + ("le",), label_values + ("+Inf",))
+            yield f"{self.name}_bucket{labels} {series[-1]}"
+            yield f"{self.name}_sum{_label_text(self.labels, label_values)} {series[-2]}"
+            yield f"{self.name}_count{_label_text(self.labels, label_values)} {series[-1]}"
+
+
+class Gauge:
+    """A value read at scrape time"""
+
+    def __init__(self, name: str, help_text: str, read):
+        self.name, self.help_text, self.read = name, help_text, read
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} gauge"
+        yield f"{self.name} {self.read()}"
+
+
+http_requests = Counter("http_requests_total", "HTTP requests by route, method and status", ("method", "route", "status"))
+http_latency = Histogram("http_request_duration_seconds", "HTTP request latency by route", ("method", "route"))
+http_db_queries = Histogram(
+    "http_request_db_queries", "Database queries issued per request", ("method", "route"), QUERY_COUNT_BUCKETS
+)
+http_db_time = Histogram("http_request_db_seconds", "Database time spent per request", ("method", "route"))
+db_queries = Counter("db_queries_total", "Database statements executed")
+db_query_latency = Histogram("db_query_duration_seconds", "Database statement latency")
+loop_lag = Histogram("event_loop_lag_seconds", "How late the event loop woke a sleeping probe")
+_last_loop_lag = 0.0
+
+METRICS = [
+    http_requests, http_latency, http_db_queries, http_db_time, db_queries, db_query_latency, loop_lag,
+    Gauge("event_loop_lag_last_seconds", "Most recent event loop lag sample", lambda: _last_loop_lag),
+    Gauge("bcrypt_queue_depth", "bcrypt hash/verify calls queued or running", bcrypt_queue_depth),
+]
+
+
+def register_gauge(name: str, help_text: str, read):
+    METRICS.append(Gauge(name, help_text, read))
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# Per-request database accounting; the middleware sets a fresh [count, seconds] for each request
+_request_db = contextvars.ContextVar("request_db", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    db_queries.inc()
+    db_query_latency.observe(elapsed)
+    usage = _request_db.get()
+    if usage is not None:
+        usage[0] += 1
+        usage[1] += elapsed
+
+
+def instrument_engines():
+    for sync_engine in (engine, async_engine.sync_engine):
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _route_label(scope) -> str:
+    """Route template, never the raw path, so ids don't explode the label set"""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    # Mounted apps (static files) leave only their mount point in root_path
+    if scope.get("root_path"):
+        return scope["root_path"] + "/*"
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording count, latency and DB usage per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        usage = [0, 0.0]
+        token = _request_db.set(usage)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_db.reset(token)
+            route_path = _route_label(scope)
+            method = scope["method"]
+            http_requests.inc(method, route_path, status["code"])
+            http_latency.observe(time.perf_counter() - started, method, route_path)
+            http_db_queries.observe(usage[0], method, route_path)
+            http_db_time.observe(usage[1], method, route_path)
+
+
+async def probe_loop_lag(interval: float = LOOP_LAG_INTERVAL):
+    """Background task: sleep for a fixed interval and record how late we woke up"""
+    global _last_loop_lag
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        _last_loop_lag = max(0.0, loop.time() - expected)
+        loop_lag.observe(_last_loop_lag)
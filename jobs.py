@@ -0,0 +1,131 @@
+import asyncio
+import json
+import os
+import uuid
+from datetime import datetime
+from sqlalchemy import update
+from app.database import AsyncSessionLocal, SessionLocal
+from app.models import Job
+
+# How many jobs of each kind may run at once; three parallel exports would exhaust memory
+JOB_CONCURRENCY = {
+    "export": int(os.environ.get("EXPORT_JOB_CONCURRENCY", "1")),
+    "upload": int(os.environ.get("UPLOAD_JOB_CONCURRENCY", "2")),
+}
+JOB_RETRY_DELAY = float(os.environ.get("JOB_RETRY_DELAY", "2"))
+
+_handlers = {}
+_semaphores = {}
+_running_tasks = set()
+
+# Live progress of running jobs; written to the job row when the attempt finishes
+_live_progress = {}
+
+
+class JobContext:
+    """Handed to job handlers to report progress"""
+
+    def __init__(self, job_id: str, attempt: int):
+        self.job_id = job_id
+        self.attempt = attempt
+
+    def report(self, progress: int, total: int = None):
+        current = _live_progress.get(self.job_id, (0, 0))
+        _live_progress[self.job_id] = (progress, current[1] if total is None else total)
+
+
+def job_handler(kind: str):
+    """Register an async handler(params, context) -> result dict for a job kind"""
+    def register(func):
+        _handlers[kind] = func
+        return func
+    return register
+
+
+def _semaphore(kind: str):
+    if kind not in _semaphores:
+        _semaphores[kind] = asyncio.Semaphore(JOB_CONCURRENCY.get(kind, 1))
+    return _semaphores[kind]
+
+
+async def _update_job(job_id: str, **values):
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(Job).where(Job.id == job_id).values(**values))
+        await db.commit()
+
+
+async def enqueue_job(kind: str, params: dict, max_attempts: int = 1) -> str:
+    """Persist a job row and schedule it on the in-process worker pool"""
+    if kind not in _handlers:
+        raise ValueError(f"No handler registered for job kind '{kind}'")
+
+    job_id = uuid.uuid4().hex
+    async with AsyncSessionLocal() as db:
+        db.add(Job(id=job_id, kind=kind, status="queued", params=json.dumps(params), max_attempts=max_attempts))
+        await db.commit()
+
+    task = asyncio.create_task(_run_job(job_id, kind, params, max_attempts))
+    _running_tasks.add(task)
+    task.add_done_callback(_running_tasks.discard)
+    return job_id
+
+
+async def _run_job(job_id: str, kind: str, params: dict, max_attempts: int):
+    handler = _handlers[kind]
+    async with _semaphore(kind):
+        for attempt in range(1, max_attempts + 1):
+            _live_progress[job_id] = (0, 0)
+            await _update_job(job_id, status="running", attempts=attempt, started_at=datetime.utcnow(), error=None)
+            try:
+                result = await handler(params, JobContext(job_id, attempt))
+            except Exception as e:
+                print(f"Job {job_id} ({kind}) attempt {attempt} failed: {e}")
+                progress, total = _live_progress.get(job_id, (0, 0))
+                if attempt < max_attempts:
+                    await _update_job(job_id, status="queued", error=str(e), progress=progress, total=total)
+                    await asyncio.sleep(JOB_RETRY_DELAY * attempt)
+                    continue
+                await _update_job(
+                    job_id, status="failed", error=str(e), progress=progress, total=total,
+                    finished_at=datetime.utcnow()
+                )
+            else:
+                progress, total = _live_progress.get(job_id, (0, 0))
+                await _update_job(
+                    job_id, status="completed", result=json.dumps(result), progress=progress, total=total,
+                    finished_at=datetime.utcnow()
+                )
+            break
+    _live_progress.pop(job_id, None)
+
+
+def job_status(job: Job) -> dict:
+    progress, total = _live_progress.get(job.id, (job.progress or 0, job.total or 0))
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "progress": progress,
+        "total": total,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def fail_interrupted_jobs():
+    """Jobs left queued/running by a previous process can't resume; mark them failed"""
+    db = SessionLocal()
+    try:
+        interrupted = db.query(Job).filter(Job.status.in_(["queued", "running"])).update(
+            {"status": "failed", "error": "Interrupted by server restart", "finished_at": datetime.utcnow()},
+            synchronize_session=False
+        )
+        db.commit()
+        return interrupted
+    finally:
+        db.close()
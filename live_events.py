@@ -0,0 +1,126 @@
+import asyncio
+import json
+import os
+from datetime import datetime
+from app.database import AsyncSessionLocal
+from app.models import FleetStats
+from app.stats_counters import FLEET_ROW_ID
+
+# Per-connection backlog; a tab that falls this far behind is told to reload instead
+EVENT_QUEUE_SIZE = int(os.environ.get("EVENT_QUEUE_SIZE", "256"))
+HEARTBEAT_SECONDS = 15
+# Stats snapshots are coalesced so a burst of submits costs one read per interval
+STATS_PUSH_INTERVAL = float(os.environ.get("STATS_PUSH_INTERVAL", "1"))
+
+
+class EventBroker:
+    """In-process pub/sub fanning dashboard events out to every connected admin tab"""
+
+    def __init__(self):
+        self._subscribers = set()
+        self._loop = None
+        self._next_id = 0
+        self.stats_dirty = False
+
+    def subscribe(self) -> asyncio.Queue:
+        self._loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=EVENT_QUEUE_SIZE)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, event: str, data: dict, stats_changed: bool = True):
+        """Queue an event for every subscriber; safe to call from worker threads.
+
+        Call it after the change is committed so listeners never see rolled-back work.
+        """
+        if stats_changed:
+            self.stats_dirty = True
+        if not self._subscribers:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._fan_out(event, data)
+        elif self._loop is not None:
+            self._loop.call_soon_threadsafe(self._fan_out, event, data)
+
+    def _fan_out(self, event: str, data: dict):
+        self._next_id += 1
+        message = (self._next_id, event, data)
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Drop the backlog and ask the tab to reload the full state
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait((self._next_id, "resync", {}))
+
+
+broker = EventBroker()
+
+
+def format_sse(event_id: int, event: str, data: dict) -> str:
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def stats_payload(fleet: FleetStats) -> dict:
+    return {
+        "total_agents": fleet.total_agents,
+        "active_agents": fleet.active_agents,
+        "total_tasks": fleet.total_tasks,
+        "completed_tasks": fleet.submissions,
+        "pending_tasks": fleet.pending_tasks,
+    }
+
+
+async def read_stats_payload():
+    async with AsyncSessionLocal() as db:
+        fleet = await db.get(FleetStats, FLEET_ROW_ID)
+        return stats_payload(fleet) if fleet else None
+
+
+async def push_stats_periodically(interval: float = STATS_PUSH_INTERVAL):
+    """Background loop: publish a fresh stats snapshot whenever counters changed"""
+    while True:
+        await asyncio.sleep(interval)
+        if not broker.stats_dirty or not broker.subscriber_count:
+            continue
+        broker.stats_dirty = False
+        try:
+            payload = await read_stats_payload()
+        except Exception as e:
+            print(f"Stats push failed: {e}")
+            continue
+        if payload:
+            broker.publish("stats", payload, stats_changed=False)
+
+
+async def event_stream(request):
+    """SSE body for one admin tab: a stats snapshot, then live events and heartbeats"""
+    queue = broker.subscribe()
+    try:
+        payload = await read_stats_payload()
+        if payload:
+            yield format_sse(0, "stats", payload)
+
+        while True:
+            try:
+                event_id, event, data = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield f": keepalive {datetime.utcnow().isoformat()}\n\n"
+                continue
+            yield format_sse(event_id, event, data)
+    finally:
+        broker.unsubscribe(queue)
@@ -1,13 +1,28 @@
+# Imported first so the startup report can time every other import
+from app.startup_report import startup_report
+startup_report.start_import_timing()
+
+import asyncio
 import os
-from fastapi import FastAPI
+import shutil
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
+from sqlalchemy import text
+
+# Import local modules through the app package, as the routes do, so every module is loaded once
+from app.agent_routes import router as agent_router
+from app.database import async_engine
+from app.migrations import MIGRATE_ON_STARTUP, pending_migrations, run_migrations
+from app.group_commit import submission_writer
+from app.jobs import fail_interrupted_jobs
+from app.image_variants import shutdown_pool
+from app.stats_counters import reconcile_periodically
+from app.live_events import broker, push_stats_periodically
+from app.instrumentation import MetricsMiddleware, instrument_engines, probe_loop_lag, register_gauge, render_metrics
+from app.static_cache import CachedStaticFiles, precompress_pages, serve_page
 
-# Import your local modules (now in same directory)
-from agent_routes import router as agent_router
-from database import Base, engine
-from models import Agent, TaskProgress, SubmittedForm, AgentSession
+startup_report.stop_import_timing()
 
 # Create directories if they don't exist
 os.makedirs("static/task_images", exist_ok=True)
@@ -31,29 +46,61 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Estimate", "X-Search-Order"],
 )
 
-# Mount static files
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Per-route request counts, latency and DB usage for /metrics
+app.add_middleware(MetricsMiddleware)
+instrument_engines()
+register_gauge("admin_event_subscribers", "Connected admin live-feed tabs", lambda: broker.subscriber_count)
+register_gauge("app_startup_seconds", "Seconds from importing main.py to serving", lambda: startup_report.ready_seconds or 0)
 
-# Create database tables on startup
-print("🔧 Creating database tables...")
-try:
-    Base.metadata.create_all(bind=engine)
-    print("✅ Database tables created successfully!")
-    
-    # Verify tables were created
-    from sqlalchemy import inspect
-    inspector = inspect(engine)
-    tables = inspector.get_table_names()
-    print(f"📋 Available tables: {', '.join(tables)}")
-    
-except Exception as e:
-    print(f"❌ Error creating database tables: {e}")
+# Mount static files (content-hash ETags, immutable caching for task images)
+app.mount("/static", CachedStaticFiles(directory="static"), name="static")
 
 # Include routers
 app.include_router(agent_router)
 
+@app.on_event("startup")
+def prepare_database():
+    """Check the schema version; migrations normally ran already (`python migrations.py`)"""
+    try:
+        with startup_report.step("schema check"):
+            pending = pending_migrations()
+        if pending and MIGRATE_ON_STARTUP:
+            with startup_report.step("migrations"):
+                run_migrations(pending)
+        elif pending:
+            print(f"⚠️ {len(pending)} schema migrations pending; run `python migrations.py`")
+        
+        with startup_report.step("interrupted jobs"):
+            interrupted = fail_interrupted_jobs()
+        if interrupted:
+            print(f"⚠️ Marked {interrupted} interrupted background jobs as failed")
+    except Exception as e:
+        print(f"❌ Error preparing database: {e}")
+
+@app.on_event("startup")
+async def start_background_tasks():
+    app.state.stats_reconciler = asyncio.create_task(reconcile_periodically())
+    app.state.stats_pusher = asyncio.create_task(push_stats_periodically())
+    app.state.loop_lag_probe = asyncio.create_task(probe_loop_lag())
+    
+    # Compress the HTML pages off the event loop; the first request builds them if it gets there first
+    asyncio.get_running_loop().run_in_executor(None, precompress_pages, ["admin.html", "agent.html"])
+    
+    startup_report.mark_ready()
+    print(f"🚀 {startup_report.summary()}")
+
+@app.on_event("shutdown")
+async def close_database():
+    app.state.stats_reconciler.cancel()
+    app.state.stats_pusher.cancel()
+    app.state.loop_lag_probe.cancel()
+    await submission_writer.close()
+    await async_engine.dispose()
+    shutdown_pool()
+
 # Root endpoint
 @app.get("/")
 def root():
@@ -71,27 +118,53 @@ def root():
     }
 
 @app.get("/health")
-def health_check():
-    return {
-        "status": "healthy", 
+async def health_check():
+    """Ping the database and check the static volume; 503 when either is unusable"""
+    checks = {}
+    try:
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        checks["database"] = "connected"
+    except Exception as e:
+        checks["database"] = f"error: {e}"
+    
+    if os.path.isdir("static") and os.access("static", os.W_OK):
+        checks["static_volume"] = "writable"
+        checks["static_free_mb"] = shutil.disk_usage("static").free // (1024 * 1024)
+    else:
+        checks["static_volume"] = "unavailable"
+    
+    healthy = checks["database"] == "connected" and checks["static_volume"] == "writable"
+    return JSONResponse(status_code=200 if healthy else 503, content={
+        "status": "healthy" if healthy else "unhealthy",
         "platform": "Replit",
-        "database": "connected",
-        "message": "All systems operational"
-    }
+        **checks,
+        "message": "All systems operational" if healthy else "One or more checks failed"
+    })
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus text exposition of request, database, bcrypt and event-loop metrics"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/admin/startup-report")
+def get_startup_report():
+    """Import cost by module and the duration of each init step for this process"""
+    return startup_report.as_dict()
 
 # Serve HTML files
 @app.get("/admin.html")
-async def serve_admin_panel():
+async def serve_admin_panel(request: Request):
     """Serve the admin dashboard"""
     if os.path.exists("admin.html"):
-        return FileResponse("admin.html")
+        return serve_page("admin.html", request)
     return {"error": "Admin panel not found"}
 
 @app.get("/agent.html")
-async def serve_agent_panel():
+async def serve_agent_panel(request: Request):
     """Serve the agent interface"""
     if os.path.exists("agent.html"):
-        return FileResponse("agent.html")
+        return serve_page("agent.html", request)
     return {"error": "Agent panel not found"}
 
 # Run the application
@@ -0,0 +1,92 @@
+"""Versioned schema and data migrations.
+
+Run once per deploy, before the web process starts:
+
+    python migrations.py
+
+At startup the app only reads the highest applied version (one query). If
+anything is pending and MIGRATE_ON_STARTUP is on (the default, so a fresh checkout
+still boots against an empty database) it applies it itself.
+"""
+import os
+import time
+from datetime import datetime
+from sqlalchemy import func, inspect, select
+from sqlalchemy.orm import Session
+from app.database import Base, engine, SessionLocal, sync_schema
+from app.models import SchemaMigration
+from app.task_assignments import backfill_all_assignments, remove_duplicate_positions
+from app.submission_records import migrate_submission_records
+from app.productivity_rollups import backfill_rollups_if_empty
+from app.stats_counters import reconcile_stats
+from app.submission_search import create_search_index
+
+MIGRATE_ON_STARTUP = os.environ.get("MIGRATE_ON_STARTUP", "1") == "1"
+
+
+def create_schema(db: Session):
+    """Create missing tables, then add columns and indexes create_all skips on existing ones"""
+    Base.metadata.create_all(bind=engine)
+    sync_schema(engine)
+    return len(Base.metadata.tables)
+
+
+def unique_assignment_positions(db: Session):
+    """Drop duplicate assignments, add the unique (agent_id, position) index, then recount stats"""
+    removed = remove_duplicate_positions(db)
+    db.commit()
+    create_schema(db)
+    reconcile_stats(db)
+    return removed
+
+
+# Append new steps with the next version number; never edit or reorder applied ones.
+# Model changes that only add tables, columns or indexes can append another create_schema.
+MIGRATIONS = [
+    (1, "create tables, columns and indexes", create_schema),
+    (2, "seed image assignments from agent folders", backfill_all_assignments),
+    (3, "copy submissions into typed records", migrate_submission_records),
+    (4, "build productivity rollups from history", backfill_rollups_if_empty),
+    (5, "count dashboard statistics", reconcile_stats),
+    (6, "build the full-text search index", create_search_index),
+    (7, "make assignment positions unique per agent", unique_assignment_positions),
+]
+
+
+def applied_version() -> int:
+    with engine.connect() as conn:
+        if not inspect(conn).has_table(SchemaMigration.__tablename__):
+            return 0
+        return conn.execute(select(func.max(SchemaMigration.version))).scalar() or 0
+
+
+def pending_migrations() -> list:
+    current = applied_version()
+    return [migration for migration in MIGRATIONS if migration[0] > current]
+
+
+def run_migrations(pending: list = None) -> int:
+    """Apply pending migrations in order, recording each one; returns how many ran"""
+    if pending is None:
+        pending = pending_migrations()
+    if not pending:
+        return 0
+
+    SchemaMigration.__table__.create(bind=engine, checkfirst=True)
+    for version, name, migrate in pending:
+        started = time.perf_counter()
+        db = SessionLocal()
+        try:
+            result = migrate(db)
+            elapsed = time.perf_counter() - started
+            db.add(SchemaMigration(version=version, name=name, applied_at=datetime.utcnow(), duration_seconds=elapsed))
+            db.commit()
+        finally:
+            db.close()
+        print(f"🔧 Migration {version}: {name} ({result}) in {elapsed:.2f}s")
+    return len(pending)
+
+
+if __name__ == "__main__":
+    applied = run_migrations()
+    print(f"✅ Schema at version {applied_version()} ({applied} migrations applied)")
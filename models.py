@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Date, DateTime, Text, ForeignKey, Float
+from sqlalchemy import Column, String, Integer, BigInteger, Date, DateTime, Text, ForeignKey, Float, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
@@ -25,11 +25,16 @@ class Agent(Base):
 
 class SubmittedForm(Base):
     __tablename__ = "submitted_forms"
+    __table_args__ = (
+        # A retried batch can never store the same queued entry twice
+        Index("ux_submitted_forms_agent_idempotency", "agent_id", "idempotency_key", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     agent_id = Column(String, ForeignKey("agents.agent_id"), nullable=False)
     form_data = Column(Text, nullable=False)  # JSON string containing all form data
     submitted_at = Column(DateTime, default=datetime.utcnow)
+    idempotency_key = Column(String, nullable=True)  # "<client_id>:<sequence>" for batched entries
 
     agent = relationship("Agent", back_populates="submitted_forms")
 
@@ -47,6 +52,14 @@ class TaskProgress(Base):
 # NEW: Agent Session Tracking
 class AgentSession(Base):
     __tablename__ = "agent_sessions"
+    __table_args__ = (
+        # Active-session lookups on login/logout (agent_id = ? AND logout_time IS NULL)
+        Index("ix_agent_sessions_agent_logout", "agent_id", "logout_time"),
+        # Per-agent history, newest first (session report, recent sessions on /api/agents)
+        Index("ix_agent_sessions_agent_login", "agent_id", "login_time"),
+        # Fleet-wide report by date range with keyset pagination
+        Index("ix_agent_sessions_login_id", "login_time", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     agent_id = Column(String, ForeignKey("agents.agent_id"), nullable=False)
@@ -58,15 +71,157 @@ class AgentSession(Base):
     
     agent = relationship("Agent", back_populates="login_sessions")
 
-# Optional: Track individual image assignments
+# Track individual image assignments - one row per task image, in task order
 class ImageAssignment(Base):
     __tablename__ = "image_assignments"
+    __table_args__ = (
+        # Serves "next pending task" and per-status counts for an agent
+        Index("ix_image_assignments_agent_status_position", "agent_id", "is_completed", "position"),
+        # One task per slot: concurrent seeding of the same agent inserts each position once
+        Index("ux_image_assignments_agent_position", "agent_id", "position", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     agent_id = Column(String, ForeignKey("agents.agent_id"))
+    position = Column(Integer, nullable=False, default=0)
     image_filename = Column(String, nullable=False)
     image_path = Column(String, nullable=False)
     assigned_at = Column(DateTime, default=datetime.utcnow)
+    completed_at = Column(DateTime, nullable=True)
     is_completed = Column(String, default="pending")  # pending, completed, skipped
-    
-    # This can help track which specific images were assigned to which agents
+
+# Content-addressed task images: each distinct file is stored once and shared by every agent it is assigned to
+class ImageBlob(Base):
+    __tablename__ = "image_blobs"
+    __table_args__ = (
+        # Lets ingest recognise known files from the ZIP directory without reading them
+        Index("ix_image_blobs_crc32_size", "crc32", "size"),
+    )
+
+    digest = Column(String, primary_key=True)  # sha256 hex
+    path = Column(String, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    crc32 = Column(BigInteger, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+# Typed, one-column-per-field copy of each submission so filters and exports run in SQL
+class SubmissionRecord(Base):
+    __tablename__ = "submission_records"
+    __table_args__ = (
+        Index("ix_submission_records_agent_submitted", "agent_id", "submitted_at"),
+        # Keyset pages of the data preview, newest first
+        Index("ix_submission_records_submitted_id", "submitted_at", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    submission_id = Column(Integer, ForeignKey("submitted_forms.id"), unique=True, nullable=False)
+    agent_id = Column(String, ForeignKey("agents.agent_id"), nullable=False, index=True)
+    submitted_at = Column(DateTime, index=True)
+    image_name = Column(String, nullable=True)
+
+    # Form fields exactly as entered
+    DR_NO = Column(String, index=True)
+    Date_Rptd = Column(String)
+    DATE_OCC = Column(String)
+    TIME_OCC = Column(String)
+    Unique_Identifier = Column(String)
+    AREA_NAME = Column(String, index=True)
+    Rpt_Dist_No = Column(String)
+    VIN = Column(String)
+    Crm = Column(String)
+    Crm_Cd_Desc = Column(String)
+    Mocodes = Column(String)
+    Vict_Age = Column(String)
+    Geolocation = Column(String)
+    DEPARTMENT = Column(String)
+    Premis_Cd = Column(String)
+    Premis_Desc = Column(String)
+    ARREST_KEY = Column(String)
+    PD_DESC = Column(String)
+    CCD_LONCOD = Column(String)
+    Status_Desc = Column(String)
+    LAW_CODE = Column(String)
+    SubAgency = Column(String)
+    Charge = Column(String)
+    Race = Column(String)
+    LOCATION = Column(String)
+    SeqID = Column(String)
+    LAT = Column(String)
+    LON = Column(String)
+    Point = Column(String)
+    Shape__Area = Column(String)
+
+    # Parsed values (NULL when the entered text could not be parsed)
+    reported_at = Column(DateTime, nullable=True)
+    occurred_at = Column(DateTime, nullable=True, index=True)
+    crime_code = Column(Integer, nullable=True, index=True)
+    premise_code = Column(Integer, nullable=True)
+    victim_age = Column(Integer, nullable=True)
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+
+# Dashboard counters per agent, updated in the same transaction as the event that changes them
+class AgentStats(Base):
+    __tablename__ = "agent_stats"
+
+    agent_id = Column(String, ForeignKey("agents.agent_id"), primary_key=True)
+    total_tasks = Column(Integer, nullable=False, default=0)
+    completed_tasks = Column(Integer, nullable=False, default=0)
+    pending_tasks = Column(Integer, nullable=False, default=0)
+    submissions = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+# Fleet-wide dashboard counters (a single row, id=1)
+class FleetStats(Base):
+    __tablename__ = "fleet_stats"
+
+    id = Column(Integer, primary_key=True)
+    total_agents = Column(Integer, nullable=False, default=0)
+    active_agents = Column(Integer, nullable=False, default=0)
+    total_tasks = Column(Integer, nullable=False, default=0)
+    pending_tasks = Column(Integer, nullable=False, default=0)
+    submissions = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    reconciled_at = Column(DateTime, nullable=True)
+
+# Productivity per agent per hour/day bucket, maintained as submissions and sessions close
+class ProductivityRollup(Base):
+    __tablename__ = "productivity_rollups"
+    __table_args__ = (
+        Index("ux_productivity_rollups_bucket", "granularity", "bucket_start", "agent_id", unique=True),
+        Index("ix_productivity_rollups_agent_bucket", "granularity", "agent_id", "bucket_start"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    granularity = Column(String, nullable=False)  # hour, day
+    bucket_start = Column(DateTime, nullable=False)
+    agent_id = Column(String, ForeignKey("agents.agent_id"), nullable=False)
+    submissions = Column(Integer, nullable=False, default=0)
+    active_minutes = Column(Float, nullable=False, default=0)
+
+# Background jobs (uploads, exports) so long work runs outside the HTTP request
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(String, primary_key=True, index=True)
+    kind = Column(String, nullable=False, index=True)  # upload, export, variants, dedupe
+    status = Column(String, default="queued", index=True)  # queued, running, completed, failed
+    params = Column(Text, nullable=True)  # JSON
+    result = Column(Text, nullable=True)  # JSON
+    error = Column(Text, nullable=True)
+    progress = Column(Integer, default=0)
+    total = Column(Integer, default=0)
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=1)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+# Versions applied by migrations.py; the app only reads the highest one at startup
+class SchemaMigration(Base):
+    __tablename__ = "schema_migrations"
+
+    version = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    applied_at = Column(DateTime, default=datetime.utcnow)
+    duration_seconds = Column(Float, nullable=True)
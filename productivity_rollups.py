@@ -0,0 +1,162 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, delete, insert, func
+from sqlalchemy.orm import Session
+from app.database import SessionLocal, upsert_insert
+from app.models import AgentSession, ProductivityRollup, SubmittedForm
+
+GRANULARITIES = ("hour", "day")
+REBUILD_BATCH_SIZE = 5000
+
+
+def bucket_start(moment: datetime, granularity: str) -> datetime:
+    if granularity == "day":
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def _add(db: Session, granularity: str, start: datetime, agent_id: str, submissions: int = 0, active_minutes: float = 0):
+    """Atomically add to one bucket, creating it on first use"""
+    values = {
+        "granularity": granularity,
+        "bucket_start": start,
+        "agent_id": agent_id,
+        "submissions": submissions,
+        "active_minutes": active_minutes,
+    }
+    upsert = upsert_insert(db.get_bind().dialect.name)
+    if upsert is not None:
+        statement = upsert(ProductivityRollup).values(**values)
+        db.execute(statement.on_conflict_do_update(
+            index_elements=["granularity", "bucket_start", "agent_id"],
+            set_={
+                "submissions": ProductivityRollup.submissions + statement.excluded.submissions,
+                "active_minutes": ProductivityRollup.active_minutes + statement.excluded.active_minutes,
+            }
+        ))
+        return
+
+    updated = db.execute(
+        update(ProductivityRollup).where(
+            ProductivityRollup.granularity == granularity,
+            ProductivityRollup.bucket_start == start,
+            ProductivityRollup.agent_id == agent_id
+        ).values(
+            submissions=ProductivityRollup.submissions + submissions,
+            active_minutes=ProductivityRollup.active_minutes + active_minutes
+        )
+    ).rowcount
+    if not updated:
+        db.execute(insert(ProductivityRollup), [values])
+
+
+def record_submissions(db: Session, agent_id: str, submitted_at: datetime, count: int = 1):
+    """Count submissions into their hour and day buckets (inside the caller's transaction)"""
+    if count:
+        for granularity in GRANULARITIES:
+            _add(db, granularity, bucket_start(submitted_at, granularity), agent_id, submissions=count)
+
+
+def split_session(login_time: datetime, logout_time: datetime, granularity: str):
+    """Yield (bucket_start, minutes) for the part of a session inside each bucket"""
+    step = timedelta(days=1) if granularity == "day" else timedelta(hours=1)
+    cursor = login_time
+    while cursor < logout_time:
+        start = bucket_start(cursor, granularity)
+        end = min(start + step, logout_time)
+        yield start, (end - cursor).total_seconds() / 60
+        cursor = end
+
+
+def record_session(db: Session, agent_id: str, login_time: datetime, logout_time: datetime):
+    """Spread a closed session's minutes over the buckets it spans"""
+    if not login_time or not logout_time:
+        return
+    for granularity in GRANULARITIES:
+        for start, minutes in split_session(login_time, logout_time, granularity):
+            _add(db, granularity, start, agent_id, active_minutes=minutes)
+
+
+def rebuild_rollups(db: Session) -> int:
+    """Recompute every bucket from the raw tables in batches and commit; returns the bucket count"""
+    buckets = defaultdict(lambda: [0, 0.0])
+
+    submissions = select(SubmittedForm.agent_id, SubmittedForm.submitted_at).where(
+        SubmittedForm.submitted_at.isnot(None)
+    ).execution_options(yield_per=REBUILD_BATCH_SIZE)
+    for agent_id, submitted_at in db.execute(submissions):
+        for granularity in GRANULARITIES:
+            buckets[(granularity, bucket_start(submitted_at, granularity), agent_id)][0] += 1
+
+    sessions = select(AgentSession.agent_id, AgentSession.login_time, AgentSession.logout_time).where(
+        AgentSession.login_time.isnot(None), AgentSession.logout_time.isnot(None)
+    ).execution_options(yield_per=REBUILD_BATCH_SIZE)
+    for agent_id, login_time, logout_time in db.execute(sessions):
+        for granularity in GRANULARITIES:
+            for start, minutes in split_session(login_time, logout_time, granularity):
+                buckets[(granularity, start, agent_id)][1] += minutes
+
+    db.execute(delete(ProductivityRollup))
+    rows = [
+        {"granularity": granularity, "bucket_start": start, "agent_id": agent_id,
+         "submissions": counts[0], "active_minutes": counts[1]}
+        for (granularity, start, agent_id), counts in buckets.items()
+    ]
+    for offset in range(0, len(rows), REBUILD_BATCH_SIZE):
+        db.execute(insert(ProductivityRollup), rows[offset:offset + REBUILD_BATCH_SIZE])
+    db.commit()
+    return len(rows)
+
+
+def rebuild_rollups_now() -> int:
+    db = SessionLocal()
+    try:
+        return rebuild_rollups(db)
+    finally:
+        db.close()
+
+
+def backfill_rollups_if_empty(db: Session) -> int:
+    """Build the rollups once for databases that have history but no buckets yet"""
+    has_buckets = db.query(ProductivityRollup.id).first() is not None
+    has_history = db.query(SubmittedForm.id).first() is not None or db.query(AgentSession.id).first() is not None
+    if has_buckets or not has_history:
+        return 0
+    return rebuild_rollups(db)
+
+
+def productivity_query(granularity: str, agent_id: str = None, date_from: datetime = None,
+                       date_to: datetime = None, per_agent: bool = True):
+    """Bucket rows for the API; reads only the rollup table"""
+    rollup = ProductivityRollup
+    if per_agent:
+        query = select(rollup.bucket_start, rollup.agent_id, rollup.submissions, rollup.active_minutes)
+    else:
+        query = select(
+            rollup.bucket_start,
+            func.sum(rollup.submissions).label("submissions"),
+            func.sum(rollup.active_minutes).label("active_minutes")
+        ).group_by(rollup.bucket_start)
+
+    query = query.where(rollup.granularity == granularity)
+    if agent_id:
+        query = query.where(rollup.agent_id == agent_id)
+    if date_from:
+        query = query.where(rollup.bucket_start >= bucket_start(date_from, granularity))
+    if date_to:
+        query = query.where(rollup.bucket_start <= date_to)
+    order = [rollup.bucket_start, rollup.agent_id] if per_agent else [rollup.bucket_start]
+    return query.order_by(*order)
+
+
+def productivity_row(row, per_agent: bool = True) -> dict:
+    active_minutes = round(row.active_minutes or 0, 2)
+    item = {
+        "bucket_start": row.bucket_start.isoformat(),
+        "submissions": row.submissions or 0,
+        "active_minutes": active_minutes,
+        "records_per_hour": round((row.submissions or 0) / (active_minutes / 60), 2) if active_minutes else None,
+    }
+    if per_agent:
+        item["agent_id"] = row.agent_id
+    return item
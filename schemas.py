@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
 from datetime import datetime
 
 class AgentStatusUpdateSchema(BaseModel):
@@ -34,3 +34,11 @@ class SubmissionResponseSchema(BaseModel):
     message: str
     success: bool
     submission_id: int
+
+class BatchRecordSchema(BaseModel):
+    sequence: int
+    fields: Dict[str, str]
+
+class SubmissionBatchSchema(BaseModel):
+    client_id: str = Field(..., min_length=1, max_length=64)
+    records: List[BatchRecordSchema] = Field(..., min_length=1, max_length=500)
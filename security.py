@@ -1,12 +1,102 @@
-from passlib.context import CryptContext
+import asyncio
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-# Password hashing configuration
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing configuration; passlib is imported on first use to keep it off the boot path
+_pwd_context = None
+
+# bcrypt runs on its own small pool so login storms can't starve the event loop
+BCRYPT_WORKERS = int(os.environ.get("BCRYPT_WORKERS", "2"))
+BCRYPT_MAX_PENDING = int(os.environ.get("BCRYPT_MAX_PENDING", "64"))
+VERIFIED_CACHE_TTL = float(os.environ.get("VERIFIED_CACHE_TTL", "300"))
+VERIFIED_CACHE_SIZE = 10000
+
+_bcrypt_executor = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+_pending_lock = threading.Lock()
+_pending = 0
+
+# Successful verifications, keyed by an HMAC of (hash, password) so plain passwords are never stored
+_cache_key = secrets.token_bytes(32)
+_verified_cache = {}
+_cache_lock = threading.Lock()
+
+
+class PasswordHashingBusy(Exception):
+    """Raised when too many hash/verify calls are already queued"""
+
+
+def _password_context():
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
 
 def hash_password(password: str) -> str:
     """Hash a password for storing in database"""
-    return pwd_context.hash(password)
+    return _password_context().hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    return _password_context().verify(plain_password, hashed_password)
+
+def bcrypt_queue_depth() -> int:
+    """Number of hash/verify calls queued or running on the bcrypt pool"""
+    return _pending
+
+async def _run_bcrypt(func, *args):
+    global _pending
+    with _pending_lock:
+        if _pending >= BCRYPT_MAX_PENDING:
+            raise PasswordHashingBusy("Password hashing queue is full")
+        _pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_bcrypt_executor, func, *args)
+    finally:
+        with _pending_lock:
+            _pending -= 1
+
+def _verified_key(plain_password: str, hashed_password: str) -> str:
+    message = f"{hashed_password}\0{plain_password}".encode("utf-8")
+    return hmac.new(_cache_key, message, hashlib.sha256).hexdigest()
+
+def _cache_lookup(key: str) -> bool:
+    with _cache_lock:
+        expires_at = _verified_cache.get(key)
+        if expires_at is None:
+            return False
+        if expires_at < time.monotonic():
+            del _verified_cache[key]
+            return False
+        return True
+
+def _cache_store(key: str):
+    now = time.monotonic()
+    with _cache_lock:
+        if len(_verified_cache) >= VERIFIED_CACHE_SIZE:
+            for expired in [k for k, expires_at in _verified_cache.items() if expires_at < now]:
+                del _verified_cache[expired]
+            if len(_verified_cache) >= VERIFIED_CACHE_SIZE:
+                _verified_cache.clear()
+        _verified_cache[key] = now + VERIFIED_CACHE_TTL
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password on the bcrypt pool"""
+    return await _run_bcrypt(hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the bcrypt pool, reusing recent successful verifications"""
+    key = _verified_key(plain_password, hashed_password)
+    if VERIFIED_CACHE_TTL > 0 and _cache_lookup(key):
+        return True
+
+    verified = await _run_bcrypt(verify_password, plain_password, hashed_password)
+    if verified and VERIFIED_CACHE_TTL > 0:
+        _cache_store(key)
+    return verified
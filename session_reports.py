@@ -0,0 +1,77 @@
+import csv
+import io
+from datetime import datetime
+from sqlalchemy import select, or_, and_
+from app.database import SessionLocal
+from app.models import Agent, AgentSession
+from app.exports import CHUNK_SIZE, EXPORT_BATCH_SIZE
+
+SESSION_REPORT_COLUMNS = [
+    "session_id", "agent_id", "agent_name", "login_time", "logout_time", "duration_minutes", "is_active"
+]
+
+
+def session_report_query(agent_id: str = None, date_from: datetime = None, date_to: datetime = None):
+    """Sessions joined to their agent's name in one query, newest first"""
+    query = select(
+        AgentSession.id,
+        AgentSession.agent_id,
+        Agent.name,
+        AgentSession.login_time,
+        AgentSession.logout_time,
+        AgentSession.duration_minutes,
+    ).outerjoin(Agent, Agent.agent_id == AgentSession.agent_id)
+
+    if agent_id:
+        query = query.where(AgentSession.agent_id == agent_id)
+    if date_from:
+        query = query.where(AgentSession.login_time >= date_from)
+    if date_to:
+        query = query.where(AgentSession.login_time <= date_to)
+    return query.order_by(AgentSession.login_time.desc(), AgentSession.id.desc())
+
+
+def encode_cursor(row) -> str:
+    return f"{row.login_time.isoformat()}_{row.id}"
+
+
+def apply_cursor(query, cursor: str):
+    """Continue after the last row of the previous page (keyset on login_time, id)"""
+    login_time, session_id = cursor.rsplit("_", 1)
+    login_time = datetime.fromisoformat(login_time)
+    session_id = int(session_id)
+    return query.where(or_(
+        AgentSession.login_time < login_time,
+        and_(AgentSession.login_time == login_time, AgentSession.id < session_id)
+    ))
+
+
+def session_row(row) -> dict:
+    return {
+        "session_id": row.id,
+        "agent_id": row.agent_id,
+        "agent_name": row.name or "Unknown",
+        "login_time": row.login_time.isoformat(),
+        "logout_time": row.logout_time.isoformat() if row.logout_time else None,
+        "duration_minutes": row.duration_minutes,
+        "is_active": row.logout_time is None
+    }
+
+
+def stream_session_csv(query):
+    """CSV of a session report, read in batches on its own session so memory stays flat"""
+    db = SessionLocal()
+    try:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(SESSION_REPORT_COLUMNS)
+        for row in db.execute(query.execution_options(yield_per=EXPORT_BATCH_SIZE)):
+            item = session_row(row)
+            writer.writerow([item[column] if item[column] is not None else "" for column in SESSION_REPORT_COLUMNS])
+            if buffer.tell() >= CHUNK_SIZE:
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue().encode("utf-8")
+    finally:
+        db.close()
@@ -0,0 +1,124 @@
+"""Where boot time goes: import cost per module and the duration of each init step.
+
+Imported first thing by main.py, which starts import timing before its other imports.
+"""
+import importlib.abc
+import sys
+import time
+from contextlib import contextmanager
+
+REPORT_TOP_IMPORTS = 15
+
+
+class _TimedLoader(importlib.abc.Loader):
+    """Wraps a module's loader to measure how long executing the module takes"""
+
+    def __init__(self, loader, timer):
+        self._loader = loader
+        self._timer = timer
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        self._timer.stack.append(0.0)
+        started = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            elapsed = time.perf_counter() - started
+            children = self._timer.stack.pop()
+            self._timer.record(module.__name__, elapsed - children)
+            if self._timer.stack:
+                self._timer.stack[-1] += elapsed
+
+
+class _ImportTimer(importlib.abc.MetaPathFinder):
+    """Meta path hook recording the self time (excluding nested imports) of each new module"""
+
+    def __init__(self):
+        self.self_times = {}
+        self.stack = []
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                    spec.loader = _TimedLoader(spec.loader, self)
+                return spec
+        return None
+
+    def record(self, name: str, seconds: float):
+        self.self_times[name] = seconds
+
+
+class StartupReport:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.import_seconds = 0.0
+        self.import_times = {}
+        self.steps = []
+        self.ready_seconds = None
+        self._timer = None
+        self._imports_started = None
+
+    def start_import_timing(self):
+        self._timer = _ImportTimer()
+        self._imports_started = time.perf_counter()
+        sys.meta_path.insert(0, self._timer)
+
+    def stop_import_timing(self):
+        if self._timer is None:
+            return
+        sys.meta_path.remove(self._timer)
+        self.import_seconds = time.perf_counter() - self._imports_started
+        self.import_times = self._timer.self_times
+        self._timer = None
+
+    @contextmanager
+    def step(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps.append((name, time.perf_counter() - started))
+
+    def mark_ready(self):
+        self.ready_seconds = time.perf_counter() - self.started
+
+    def imports_by_module(self) -> list:
+        """Self time grouped by top-level package; the app's own modules are listed individually"""
+        grouped = {}
+        for name, seconds in self.import_times.items():
+            parts = name.split(".")
+            key = ".".join(parts[:2]) if parts[0] == "app" else parts[0]
+            count, total = grouped.get(key, (0, 0.0))
+            grouped[key] = (count + 1, total + seconds)
+        return sorted(
+            ({"module": key, "modules": count, "seconds": round(total, 4)} for key, (count, total) in grouped.items()),
+            key=lambda item: item["seconds"], reverse=True
+        )
+
+    def as_dict(self) -> dict:
+        return {
+            "ready_seconds": round(self.ready_seconds, 4) if self.ready_seconds is not None else None,
+            "import_seconds": round(self.import_seconds, 4),
+            "init_seconds": round(sum(seconds for _, seconds in self.steps), 4),
+            "steps": [{"step": name, "seconds": round(seconds, 4)} for name, seconds in self.steps],
+            "imports": self.imports_by_module()[:REPORT_TOP_IMPORTS],
+        }
+
+    def summary(self) -> str:
+        slowest = ", ".join(f"{item['module']} {item['seconds']:.2f}s" for item in self.imports_by_module()[:5])
+        steps = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.steps)
+        return (f"Ready in {self.ready_seconds:.2f}s (imports {self.import_seconds:.2f}s: {slowest}; "
+                f"init: {steps or 'none'})")
+
+
+startup_report = StartupReport()
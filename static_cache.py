@@ -0,0 +1,162 @@
+import gzip
+import hashlib
+import os
+import threading
+from fastapi import Request
+from fastapi.responses import Response
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from app.blob_store import BLOB_ROOT
+from app.task_manifest import TASK_IMAGES_ROOT
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; pages are still served gzip-compressed
+    brotli = None
+
+# Blobs never change in place (they are named by their sha256), so browsers may keep them for a year
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+STATIC_CACHE_CONTROL = "public, max-age=3600"
+# HTML and the legacy task image folders (per-agent and crime_records_wide, where a
+# re-uploaded image keeps its name) are always revalidated: a 304 when nothing changed
+PAGE_CACHE_CONTROL = "no-cache"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+BLOB_PREFIX = os.path.abspath(BLOB_ROOT) + os.sep
+TASK_IMAGES_PREFIX = os.path.abspath(TASK_IMAGES_ROOT) + os.sep
+HASH_BUFFER_SIZE = 1024 * 1024
+
+_etags = {}
+_etags_lock = threading.Lock()
+
+
+def _file_digest(path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as source:
+        while True:
+            chunk = source.read(HASH_BUFFER_SIZE)
+            if not chunk:
+                break
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def content_etag(path: str, stat_result: os.stat_result) -> str:
+    """Strong ETag from the file's content hash, computed once per file version.
+
+    Only files outside the blob store are hashed, and those are small legacy images.
+    """
+    # Blob names already carry the sha256 of their source image
+    if os.path.abspath(path).startswith(BLOB_PREFIX):
+        return f'"{os.path.basename(path)}"'
+
+    key = (path, stat_result.st_mtime_ns, stat_result.st_size)
+    etag = _etags.get(key)
+    if etag is None:
+        etag = f'"{_file_digest(path)[:32]}"'
+        with _etags_lock:
+            _etags[key] = etag
+    return etag
+
+
+def etag_matches(request_headers: Headers, etags) -> bool:
+    if_none_match = request_headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return any(etag in candidates for etag in etags)
+
+
+def cache_control(path: str) -> str:
+    absolute = os.path.abspath(path)
+    if absolute.startswith(BLOB_PREFIX):
+        return IMMUTABLE_CACHE_CONTROL
+    if absolute.startswith(TASK_IMAGES_PREFIX):
+        return REVALIDATE_CACHE_CONTROL
+    return STATIC_CACHE_CONTROL
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles with content-hash ETags and long-lived caching for blob-store images.
+
+    Range requests and If-Modified-Since are handled by Starlette's FileResponse.
+    """
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        headers = {
+            "etag": content_etag(str(full_path), stat_result),
+            "cache-control": cache_control(str(full_path)),
+        }
+
+        if status_code == 200 and etag_matches(request_headers, [headers["etag"]]):
+            return Response(status_code=304, headers=headers)
+
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result)
+        response.headers.update(headers)
+        if self.is_not_modified(response.headers, request_headers):
+            return Response(status_code=304, headers=headers)
+        return response
+
+
+class PrecompressedPage:
+    """An HTML page held in memory as identity, gzip and (when available) brotli bodies"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.mtime_ns = os.stat(path).st_mtime_ns
+        with open(path, "rb") as page_file:
+            body = page_file.read()
+
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.bodies = {"identity": body, "gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            self.bodies["br"] = brotli.compress(body, quality=11)
+        self.etags = {encoding: f'"{digest}-{encoding}"' for encoding in self.bodies}
+
+    def pick_encoding(self, accept_encoding: str) -> str:
+        accepted = {part.split(";")[0].strip().lower() for part in accept_encoding.split(",")}
+        for encoding in ("br", "gzip"):
+            if encoding in self.bodies and encoding in accepted:
+                return encoding
+        return "identity"
+
+
+_pages = {}
+_pages_lock = threading.Lock()
+
+
+def load_page(path: str) -> PrecompressedPage:
+    """Cached precompressed page, rebuilt when the file on disk changes"""
+    page = _pages.get(path)
+    if page is None or page.mtime_ns != os.stat(path).st_mtime_ns:
+        with _pages_lock:
+            page = PrecompressedPage(path)
+            _pages[path] = page
+    return page
+
+
+def precompress_pages(paths: list) -> list:
+    """Warm the page cache at startup; returns the pages that exist"""
+    return [load_page(path).path for path in paths if os.path.exists(path)]
+
+
+def serve_page(path: str, request: Request) -> Response:
+    """Serve a precompressed HTML page with an ETag, answering 304 when the client copy is current"""
+    page = load_page(path)
+    encoding = page.pick_encoding(request.headers.get("accept-encoding", ""))
+    headers = {
+        "etag": page.etags[encoding],
+        "cache-control": PAGE_CACHE_CONTROL,
+        "vary": "Accept-Encoding",
+    }
+
+    if etag_matches(request.headers, [page.etags[encoding]]):
+        return Response(status_code=304, headers=headers)
+
+    if encoding != "identity":
+        headers["content-encoding"] = encoding
+    return Response(content=page.bodies[encoding], media_type="text/html", headers=headers)
@@ -0,0 +1,156 @@
+import asyncio
+import os
+from datetime import datetime
+from sqlalchemy import update, delete, insert, func
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models import Agent, AgentStats, FleetStats, ImageAssignment, SubmittedForm
+
+FLEET_ROW_ID = 1
+AGENT_COUNTERS = ("total_tasks", "completed_tasks", "pending_tasks", "submissions")
+FLEET_COUNTERS = ("total_agents", "active_agents", "total_tasks", "pending_tasks", "submissions")
+
+# Counters are exact as long as every write goes through bump_stats; reconciliation
+# repairs drift from manual database edits or writes that bypassed the helpers
+STATS_RECONCILE_INTERVAL = int(os.environ.get("STATS_RECONCILE_INTERVAL", "300"))
+
+
+def _increments(model, deltas: dict, counters: tuple) -> dict:
+    return {
+        name: getattr(model, name) + delta
+        for name, delta in deltas.items() if name in counters and delta
+    }
+
+
+def bump_stats(db: Session, agent_id: str = None, **deltas):
+    """Apply counter deltas (e.g. pending_tasks=-1) inside the caller's transaction, after its write"""
+    now = datetime.utcnow()
+
+    agent_values = _increments(AgentStats, deltas, AGENT_COUNTERS)
+    if agent_id and agent_values:
+        updated = db.execute(
+            update(AgentStats).where(AgentStats.agent_id == agent_id).values(updated_at=now, **agent_values)
+        ).rowcount
+        if not updated:
+            # Agent predates the counters table; count it from scratch (this includes the current event)
+            reconcile_agent(db, agent_id)
+
+    fleet_values = _increments(FleetStats, deltas, FLEET_COUNTERS)
+    if fleet_values:
+        db.execute(update(FleetStats).where(FleetStats.id == FLEET_ROW_ID).values(updated_at=now, **fleet_values))
+
+
+def add_agent_stats(db: Session, agent_id: str, active: bool):
+    """Counters for a newly registered agent"""
+    db.add(AgentStats(agent_id=agent_id))
+    bump_stats(db, total_agents=1, active_agents=1 if active else 0)
+
+
+def remove_agent_stats(db: Session, agent_id: str, was_active: bool):
+    """Drop a deleted agent's counters; its tasks stay in the fleet totals like the rows they count"""
+    db.execute(delete(AgentStats).where(AgentStats.agent_id == agent_id))
+    bump_stats(db, total_agents=-1, active_agents=-1 if was_active else 0)
+
+
+def status_change_stats(db: Session, old_status: str, new_status: str):
+    if (old_status == "active") != (new_status == "active"):
+        bump_stats(db, active_agents=1 if new_status == "active" else -1)
+
+
+def _agent_counts(db: Session, agent_id: str = None) -> dict:
+    """Counters recomputed from the source tables, keyed by agent_id"""
+    assignments = db.query(
+        ImageAssignment.agent_id, ImageAssignment.is_completed, func.count(ImageAssignment.id)
+    )
+    submissions = db.query(SubmittedForm.agent_id, func.count(SubmittedForm.id))
+    agents = db.query(Agent.agent_id)
+    if agent_id is not None:
+        assignments = assignments.filter(ImageAssignment.agent_id == agent_id)
+        submissions = submissions.filter(SubmittedForm.agent_id == agent_id)
+        agents = agents.filter(Agent.agent_id == agent_id)
+
+    counts = {
+        row_agent_id: {name: 0 for name in AGENT_COUNTERS}
+        for (row_agent_id,) in agents
+    }
+    for row_agent_id, status, count in assignments.group_by(ImageAssignment.agent_id, ImageAssignment.is_completed):
+        if row_agent_id in counts:
+            counts[row_agent_id]["total_tasks"] += count
+            if status == "pending":
+                counts[row_agent_id]["pending_tasks"] += count
+            elif status == "completed":
+                counts[row_agent_id]["completed_tasks"] += count
+    for row_agent_id, count in submissions.group_by(SubmittedForm.agent_id):
+        if row_agent_id in counts:
+            counts[row_agent_id]["submissions"] = count
+    return counts
+
+
+def reconcile_agent(db: Session, agent_id: str):
+    counts = _agent_counts(db, agent_id).get(agent_id)
+    if counts is None:
+        return
+    db.execute(delete(AgentStats).where(AgentStats.agent_id == agent_id))
+    db.execute(insert(AgentStats), [dict(agent_id=agent_id, updated_at=datetime.utcnow(), **counts)])
+
+
+def reconcile_stats(db: Session):
+    """Recompute every counter from the source tables and commit (startup and periodic drift repair)"""
+    now = datetime.utcnow()
+
+    # Clearing first takes the write lock on SQLite, so no event lands between count and rewrite
+    db.execute(delete(AgentStats))
+    db.execute(delete(FleetStats))
+
+    counts = _agent_counts(db)
+    if counts:
+        db.execute(insert(AgentStats), [
+            dict(agent_id=agent_id, updated_at=now, **agent_counts)
+            for agent_id, agent_counts in counts.items()
+        ])
+
+    # Fleet totals count every row, as the dashboard always has
+    status_counts = dict(db.query(ImageAssignment.is_completed, func.count(ImageAssignment.id)).group_by(
+        ImageAssignment.is_completed
+    ).all())
+    db.add(FleetStats(
+        id=FLEET_ROW_ID,
+        total_agents=db.query(func.count(Agent.id)).scalar() or 0,
+        active_agents=db.query(func.count(Agent.id)).filter(Agent.status == "active").scalar() or 0,
+        total_tasks=sum(status_counts.values()),
+        pending_tasks=status_counts.get("pending", 0),
+        submissions=db.query(func.count(SubmittedForm.id)).scalar() or 0,
+        updated_at=now,
+        reconciled_at=now,
+    ))
+    db.commit()
+    return len(counts)
+
+
+def read_fleet_stats(db: Session):
+    """The dashboard totals: a single-row primary-key read"""
+    fleet = db.get(FleetStats, FLEET_ROW_ID)
+    if fleet is None:
+        reconcile_stats(db)
+        fleet = db.get(FleetStats, FLEET_ROW_ID)
+    return fleet
+
+
+def reconcile_stats_now():
+    """Reconcile on a fresh session (for threads and the background loop)"""
+    db = SessionLocal()
+    try:
+        return reconcile_stats(db)
+    finally:
+        db.close()
+
+
+async def reconcile_periodically(interval: int = STATS_RECONCILE_INTERVAL):
+    """Background loop started with the app"""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await loop.run_in_executor(None, reconcile_stats_now)
+        except Exception as e:
+            print(f"Stats reconciliation failed: {e}")
@@ -0,0 +1,84 @@
+from datetime import datetime
+from sqlalchemy import select, func, or_, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import AgentStats, FleetStats, SubmissionRecord
+from app.exports import EXPORT_COLUMNS
+from app.stats_counters import FLEET_ROW_ID
+from app.submission_records import FORM_FIELDS
+
+PREVIEW_DEFAULT_LIMIT = 50
+PREVIEW_MAX_LIMIT = 500
+# Filtered totals are counted up to this many rows; beyond it the preview says "N+"
+PREVIEW_COUNT_CAP = 10000
+
+# Same column names as the export, so a preview reads like the file it previews
+PREVIEW_COLUMNS = dict(zip(EXPORT_COLUMNS, [
+    SubmissionRecord.submission_id,
+    SubmissionRecord.agent_id,
+    SubmissionRecord.submitted_at,
+    SubmissionRecord.image_name,
+] + [getattr(SubmissionRecord, field) for field in FORM_FIELDS]))
+
+
+def parse_columns(columns: str = None) -> list:
+    """Validate a comma-separated column projection; all export columns when omitted"""
+    if not columns:
+        return list(PREVIEW_COLUMNS)
+    names = [name.strip() for name in columns.split(",") if name.strip()]
+    unknown = [name for name in names if name not in PREVIEW_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    return names
+
+
+def preview_query(criteria: list, columns: list):
+    """Projected submission records, newest first (keyset on submitted_at, id)"""
+    return select(
+        SubmissionRecord.id.label("cursor_id"),
+        SubmissionRecord.submitted_at.label("cursor_at"),
+        *[PREVIEW_COLUMNS[name].label(name) for name in columns]
+    ).where(*criteria).order_by(SubmissionRecord.submitted_at.desc(), SubmissionRecord.id.desc())
+
+
+def encode_preview_cursor(row) -> str:
+    return f"{row.cursor_at.isoformat()}_{row.cursor_id}"
+
+
+def apply_preview_cursor(query, cursor: str):
+    """Continue after the last row of the previous page"""
+    submitted_at, record_id = cursor.rsplit("_", 1)
+    submitted_at = datetime.fromisoformat(submitted_at)
+    record_id = int(record_id)
+    return query.where(or_(
+        SubmissionRecord.submitted_at < submitted_at,
+        and_(SubmissionRecord.submitted_at == submitted_at, SubmissionRecord.id < record_id)
+    ))
+
+
+def preview_row(row, columns: list) -> dict:
+    item = {}
+    for name in columns:
+        value = getattr(row, name)
+        if isinstance(value, datetime):
+            value = value.strftime('%Y-%m-%d %H:%M:%S')
+        item[name] = value if value is not None else ''
+    return item
+
+
+async def estimate_total(db: AsyncSession, criteria: list, agent_id: str = None, filtered: bool = False) -> str:
+    """Row count for the preview header without scanning a million rows.
+
+    Unfiltered and agent-only previews read the maintained counters; other filters
+    count at most PREVIEW_COUNT_CAP matching rows.
+    """
+    if not filtered:
+        if agent_id:
+            total = await db.scalar(select(AgentStats.submissions).where(AgentStats.agent_id == agent_id))
+        else:
+            total = await db.scalar(select(FleetStats.submissions).where(FleetStats.id == FLEET_ROW_ID))
+        if total is not None:
+            return str(total)
+
+    capped = select(SubmissionRecord.id).where(*criteria).limit(PREVIEW_COUNT_CAP + 1).subquery()
+    total = await db.scalar(select(func.count()).select_from(capped))
+    return f"{PREVIEW_COUNT_CAP}+" if total > PREVIEW_COUNT_CAP else str(total)
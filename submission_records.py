@@ -0,0 +1,105 @@
+import json
+from datetime import datetime
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from app.models import SubmittedForm, SubmissionRecord
+
+# All crime record form fields, in export order
+FORM_FIELDS = [
+    'DR_NO', 'Date_Rptd', 'DATE_OCC', 'TIME_OCC', 'Unique_Identifier',
+    'AREA_NAME', 'Rpt_Dist_No', 'VIN', 'Crm', 'Crm_Cd_Desc', 'Mocodes',
+    'Vict_Age', 'Geolocation', 'DEPARTMENT', 'Premis_Cd', 'Premis_Desc',
+    'ARREST_KEY', 'PD_DESC', 'CCD_LONCOD', 'Status_Desc', 'LAW_CODE',
+    'SubAgency', 'Charge', 'Race', 'LOCATION', 'SeqID', 'LAT', 'LON',
+    'Point', 'Shape__Area'
+]
+
+# Formats agents type dates in (agent.html validates MM/DD/YYYY HH:MM AM/PM)
+DATE_FORMATS = ("%m/%d/%Y %I:%M %p", "%m/%d/%Y %H:%M", "%m/%d/%Y", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d")
+
+MIGRATION_BATCH_SIZE = 1000
+
+
+def parse_date(value):
+    if not value:
+        return None
+    value = value.strip()
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format)
+        except ValueError:
+            continue
+    return None
+
+
+def parse_int(value):
+    try:
+        return int(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_float(value):
+    try:
+        return float(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def record_values(submission_id: int, agent_id: str, submitted_at, form_data: dict) -> dict:
+    """Column values for one SubmissionRecord row built from decoded form data"""
+    values = {
+        "submission_id": submission_id,
+        "agent_id": agent_id,
+        "submitted_at": submitted_at,
+        "image_name": form_data.get("image_name"),
+        "reported_at": parse_date(form_data.get("Date_Rptd")),
+        "occurred_at": parse_date(form_data.get("DATE_OCC")),
+        "crime_code": parse_int(form_data.get("Crm")),
+        "premise_code": parse_int(form_data.get("Premis_Cd")),
+        "victim_age": parse_int(form_data.get("Vict_Age")),
+        "latitude": parse_float(form_data.get("LAT")),
+        "longitude": parse_float(form_data.get("LON")),
+    }
+    for field in FORM_FIELDS:
+        values[field] = form_data.get(field)
+    return values
+
+
+def build_submission_record(submission: SubmittedForm, form_data: dict) -> SubmissionRecord:
+    return SubmissionRecord(**record_values(
+        submission.id, submission.agent_id, submission.submitted_at, form_data
+    ))
+
+
+def migrate_submission_records(db: Session, batch_size: int = MIGRATION_BATCH_SIZE):
+    """Copy JSON-blob submissions that have no typed record yet, one batch per transaction"""
+    migrated = 0
+    last_id = 0
+    while True:
+        batch = db.query(SubmittedForm.id, SubmittedForm.agent_id, SubmittedForm.submitted_at, SubmittedForm.form_data).outerjoin(
+            SubmissionRecord, SubmissionRecord.submission_id == SubmittedForm.id
+        ).filter(
+            SubmissionRecord.id.is_(None),
+            SubmittedForm.id > last_id
+        ).order_by(SubmittedForm.id).limit(batch_size).all()
+
+        if not batch:
+            break
+
+        rows = []
+        for submission_id, agent_id, submitted_at, form_data in batch:
+            try:
+                decoded = json.loads(form_data)
+            except (TypeError, json.JSONDecodeError) as e:
+                print(f"JSON decode error for submission {submission_id}: {e}")
+                continue
+            rows.append(record_values(submission_id, agent_id, submitted_at, decoded))
+
+        if rows:
+            db.execute(insert(SubmissionRecord), rows)
+        db.commit()
+
+        migrated += len(rows)
+        last_id = batch[-1][0]
+    return migrated
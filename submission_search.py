@@ -0,0 +1,163 @@
+"""Full-text search over submitted records with SQLite FTS5.
+
+submission_search is an external-content FTS5 table over submission_records: it
+stores only the index, and triggers update it with every insert, update and delete
+of a record, so single submits, batches, group commits and backfills all feed it.
+The trigram tokenizer matches any fragment of three or more characters, which is
+what a partial DR_NO or Mocodes lookup needs.
+"""
+import html
+import re
+from sqlalchemy import select, func, literal_column, or_, and_, text, table, column
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.models import SubmissionRecord
+
+SEARCH_TABLE = "submission_search"
+SEARCH_FIELDS = ["DR_NO", "LOCATION", "Crm_Cd_Desc", "Mocodes"]
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+# bm25 has to score every match before the first page can be sorted (about 0.7s for
+# 300k matches). Up to this many matches results are ranked; beyond it they are listed
+# newest first, which FTS5 streams without sorting, and the total reads "N+".
+SEARCH_RANK_LIMIT = 10000
+RECENT_CURSOR = "recent"
+# Trigrams cannot match anything shorter
+SEARCH_MIN_TERM = 3
+SNIPPET_TOKENS = 12
+
+# Highlight markers that cannot appear in form input; swapped for <mark> after escaping
+_MARK_OPEN, _MARK_CLOSE = "\x02", "\x03"
+_TERM_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+
+_fields = ", ".join(SEARCH_FIELDS)
+_new_values = ", ".join(f"new.{field}" for field in SEARCH_FIELDS)
+_old_values = ", ".join(f"old.{field}" for field in SEARCH_FIELDS)
+SEARCH_SCHEMA = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        {_fields}, content='submission_records', content_rowid='id', tokenize='trigram'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_insert AFTER INSERT ON submission_records BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, {_fields}) VALUES (new.id, {_new_values});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_delete AFTER DELETE ON submission_records BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, {_fields}) VALUES ('delete', old.id, {_old_values});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_update AFTER UPDATE OF {_fields} ON submission_records BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, {_fields}) VALUES ('delete', old.id, {_old_values});
+        INSERT INTO {SEARCH_TABLE}(rowid, {_fields}) VALUES (new.id, {_new_values});
+    END""",
+]
+
+search_table = table(SEARCH_TABLE, column("rowid"), column("rank"))
+# The table name as a value: the left side of MATCH and the first argument of highlight()
+_search = literal_column(SEARCH_TABLE)
+_rowid = search_table.c.rowid
+_rank = search_table.c.rank
+
+
+def search_supported(dialect_name: str) -> bool:
+    return dialect_name == "sqlite"
+
+
+def create_search_index(db: Session):
+    """Create the FTS5 table and its triggers, then index every existing record"""
+    if not search_supported(db.get_bind().dialect.name):
+        print("⚠️ Full-text search needs SQLite FTS5; skipping the search index")
+        return 0
+    for statement in SEARCH_SCHEMA:
+        db.execute(text(statement))
+    # 'rebuild' re-reads the whole content table, so it is also safe to rerun
+    db.execute(text(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')"))
+    db.commit()
+    return db.scalar(select(func.count(SubmissionRecord.id)))
+
+
+def build_match(q: str, field: str = None) -> str:
+    """FTS5 query for the user's terms: all must match, each as a literal fragment.
+
+    Quoted text is kept as one fragment; terms shorter than SEARCH_MIN_TERM are
+    dropped because trigrams cannot match them.
+    """
+    if field is not None and field not in SEARCH_FIELDS:
+        raise ValueError(f"Unknown search field. Use one of: {', '.join(SEARCH_FIELDS)}")
+    terms = [quoted or bare for quoted, bare in _TERM_PATTERN.findall(q)]
+    terms = [term for term in terms if len(term.strip()) >= SEARCH_MIN_TERM]
+    if not terms:
+        raise ValueError(f"Search terms need at least {SEARCH_MIN_TERM} characters")
+    phrases = ['"' + term.replace('"', '""') + '"' for term in terms]
+    if field:
+        phrases = [f"{field} : {phrase}" for phrase in phrases]
+    return " AND ".join(phrases)
+
+
+def search_query(match: str, criteria: list, ranked: bool = True, after: tuple = None):
+    """Matching records with the export's filters.
+
+    Best match first (keyset on rank, rowid) when ranked, otherwise newest first (keyset on rowid).
+    """
+    highlights = [
+        func.highlight(_search, index, _MARK_OPEN, _MARK_CLOSE).label(f"highlight_{field}")
+        for index, field in enumerate(SEARCH_FIELDS)
+    ]
+    query = select(
+        _rowid.label("cursor_id"),
+        _rank.label("cursor_rank") if ranked else literal_column("NULL").label("cursor_rank"),
+        SubmissionRecord.submission_id,
+        SubmissionRecord.agent_id,
+        SubmissionRecord.submitted_at,
+        SubmissionRecord.image_name,
+        func.snippet(_search, -1, _MARK_OPEN, _MARK_CLOSE, "…", SNIPPET_TOKENS).label("snippet"),
+        *highlights
+    ).select_from(search_table).join(
+        SubmissionRecord, SubmissionRecord.id == _rowid
+    ).where(_search.op("MATCH")(match), *criteria)
+
+    if not ranked:
+        if after:
+            query = query.where(_rowid < after[1])
+        return query.order_by(_rowid.desc())
+    if after:
+        rank, record_id = after
+        query = query.where(or_(_rank > rank, and_(_rank == rank, _rowid > record_id)))
+    return query.order_by(_rank, _rowid)
+
+
+def encode_search_cursor(row) -> str:
+    rank = RECENT_CURSOR if row.cursor_rank is None else repr(row.cursor_rank)
+    return f"{rank}_{row.cursor_id}"
+
+
+def parse_search_cursor(cursor: str) -> tuple:
+    """(rank, rowid) of the last row of the previous page; rank is None for newest-first pages"""
+    rank, record_id = cursor.rsplit("_", 1)
+    return (None if rank == RECENT_CURSOR else float(rank)), int(record_id)
+
+
+def _marked(value: str) -> str:
+    """HTML-escape a highlighted value and turn the markers into <mark> tags"""
+    return html.escape(value or "").replace(_MARK_OPEN, "<mark>").replace(_MARK_CLOSE, "</mark>")
+
+
+def search_row(row) -> dict:
+    return {
+        "submission_id": row.submission_id,
+        "agent_id": row.agent_id,
+        "submitted_at": row.submitted_at.strftime('%Y-%m-%d %H:%M:%S') if row.submitted_at else '',
+        "image_name": row.image_name or '',
+        "snippet": _marked(row.snippet),
+        "fields": {field: _marked(getattr(row, f"highlight_{field}")) for field in SEARCH_FIELDS},
+    }
+
+
+async def count_matches(db: AsyncSession, match: str, criteria: list) -> int:
+    """Number of matching records, counted up to one past SEARCH_RANK_LIMIT"""
+    matches = select(_rowid)
+    if criteria:
+        matches = matches.join(SubmissionRecord, SubmissionRecord.id == _rowid)
+    capped = matches.where(_search.op("MATCH")(match), *criteria).limit(SEARCH_RANK_LIMIT + 1).subquery()
+    return await db.scalar(select(func.count()).select_from(capped))
+
+
+def format_total(total: int) -> str:
+    return f"{SEARCH_RANK_LIMIT}+" if total > SEARCH_RANK_LIMIT else str(total)
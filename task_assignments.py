@@ -0,0 +1,236 @@
+import os
+from datetime import datetime
+from sqlalchemy import insert, update, delete, select, case, func
+from sqlalchemy.orm import Session
+from app.database import upsert_insert
+from app.models import Agent, ImageAssignment, TaskProgress
+from app.task_manifest import get_task_manifest, agent_folder, list_images
+from app.stats_counters import bump_stats
+
+
+def create_assignments(db: Session, agent_id: str, folder: str, filenames: list, completed_count: int = 0):
+    """Seed one assignment per image in a folder, appended after the agent's existing tasks.
+
+    Two first requests for an agent can both get here; positions another request has
+    already seeded are skipped rather than duplicated.
+    """
+    images = [(filename, f"{folder}/{filename}") for filename in filenames]
+    return insert_assignments(db, agent_id, images, completed_count, skip_taken=True)
+
+
+def insert_assignments(db: Session, agent_id: str, images: list, completed_count: int = 0, skip_taken: bool = False):
+    """Bulk-insert assignments for (filename, path) pairs; the first completed_count are marked done.
+
+    With skip_taken, rows whose (agent_id, position) already exists are left out
+    (ON CONFLICT DO NOTHING) and only the rows actually inserted are counted.
+    """
+    if not images:
+        return 0
+
+    last_position = db.query(func.max(ImageAssignment.position)).filter(
+        ImageAssignment.agent_id == agent_id
+    ).scalar()
+    start = 0 if last_position is None else last_position + 1
+    now = datetime.utcnow()
+
+    rows = []
+    for offset, (filename, path) in enumerate(images):
+        done = offset < completed_count
+        rows.append({
+            "agent_id": agent_id,
+            "position": start + offset,
+            "image_filename": filename,
+            "image_path": path,
+            "assigned_at": now,
+            "completed_at": now if done else None,
+            "is_completed": "completed" if done else "pending",
+        })
+
+    upsert = upsert_insert(db.get_bind().dialect.name) if skip_taken else None
+    if upsert is not None:
+        statuses = db.connection().execute(
+            upsert(ImageAssignment.__table__)
+            .on_conflict_do_nothing(index_elements=["agent_id", "position"])
+            .returning(ImageAssignment.__table__.c.is_completed),
+            rows
+        ).scalars().all()
+    else:
+        db.execute(insert(ImageAssignment), rows)
+        statuses = [row["is_completed"] for row in rows]
+
+    done = statuses.count("completed")
+    bump_stats(db, agent_id, total_tasks=len(statuses), pending_tasks=len(statuses) - done, completed_tasks=done)
+    return len(statuses)
+
+
+def seed_assignments_from_disk(db: Session, agent_id: str):
+    """Backfill assignments for agents whose images predate the assignments table"""
+    manifest = get_task_manifest(agent_id)
+    if not len(manifest):
+        return 0
+
+    progress = db.query(TaskProgress).filter(TaskProgress.agent_id == agent_id).first()
+    completed_count = progress.current_index if progress else 0
+    return create_assignments(db, agent_id, manifest.folder, manifest.images, completed_count)
+
+
+def assign_uploaded_images(db: Session, agent_id: str, images: list):
+    """Queue freshly uploaded (filename, blob path) images for an agent, making sure it has a progress tracker"""
+    progress = db.query(TaskProgress).filter(TaskProgress.agent_id == agent_id).first()
+    if not progress:
+        progress = TaskProgress(agent_id=agent_id, current_index=0)
+        db.add(progress)
+        db.flush()
+
+    # Images already sitting in the agent's own folder keep their place ahead of the upload
+    if not has_assignments(db, agent_id):
+        folder = agent_folder(agent_id)
+        if os.path.isdir(folder):
+            create_assignments(db, agent_id, folder, list_images(folder), progress.current_index)
+
+    # New images are queued after the agent's existing tasks
+    return insert_assignments(db, agent_id, sorted(images))
+
+
+def has_assignments(db: Session, agent_id: str) -> bool:
+    return db.query(ImageAssignment.id).filter(ImageAssignment.agent_id == agent_id).first() is not None
+
+
+def get_next_assignment(db: Session, agent_id: str):
+    """First pending assignment in task order (single indexed row)"""
+    return db.query(ImageAssignment).filter(
+        ImageAssignment.agent_id == agent_id,
+        ImageAssignment.is_completed == "pending"
+    ).order_by(ImageAssignment.position).first()
+
+
+def get_upcoming_assignments(db: Session, agent_id: str, from_position: int = None, limit: int = 5):
+    """Next pending assignments in task order, optionally starting at a task position"""
+    query = db.query(ImageAssignment).filter(
+        ImageAssignment.agent_id == agent_id,
+        ImageAssignment.is_completed == "pending"
+    )
+    if from_position is not None:
+        query = query.filter(ImageAssignment.position >= from_position)
+    return query.order_by(ImageAssignment.position).limit(limit).all()
+
+
+def get_or_seed_next_assignment(db: Session, agent_id: str):
+    """Next pending assignment, seeding rows from disk the first time an agent is seen.
+
+    Seeded rows are only flushed: submits reach this inside a group-commit batch, so
+    committing is left to the caller (or the writer). When a concurrent request seeded
+    first nothing is inserted here, and the lookup is repeated to pick up its rows.
+    """
+    assignment = get_next_assignment(db, agent_id)
+    if assignment is None and not has_assignments(db, agent_id):
+        seed_assignments_from_disk(db, agent_id)
+        db.flush()
+        assignment = get_next_assignment(db, agent_id)
+    return assignment
+
+
+def claim_next_assignment(db: Session, agent_id: str, completed_at: datetime):
+    """Atomically mark the next pending assignment completed and return it.
+
+    The compare-and-set UPDATE only matches while the row is still pending, so two
+    concurrent submits for the same agent can never complete the same image.
+    """
+    while True:
+        assignment = get_or_seed_next_assignment(db, agent_id)
+        if assignment is None:
+            return None
+
+        claimed = db.execute(
+            update(ImageAssignment)
+            .where(ImageAssignment.id == assignment.id, ImageAssignment.is_completed == "pending")
+            .values(is_completed="completed", completed_at=completed_at)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if claimed:
+            bump_stats(db, agent_id, pending_tasks=-1, completed_tasks=1)
+            db.refresh(assignment)
+            return assignment
+        db.expire(assignment)
+
+
+def claim_assignments(db: Session, agent_id: str, count: int, completed_at: datetime) -> list:
+    """Claim up to count pending assignments in task order (fewer when the agent runs out).
+
+    Every row goes through the same compare-and-set as claim_next_assignment; rows taken
+    by a concurrent submit are skipped and replaced by later ones.
+    """
+    claimed = []
+    while len(claimed) < count:
+        get_or_seed_next_assignment(db, agent_id)
+        candidates = get_upcoming_assignments(db, agent_id, limit=count - len(claimed))
+        if not candidates:
+            break
+
+        for assignment in candidates:
+            won = db.execute(
+                update(ImageAssignment)
+                .where(ImageAssignment.id == assignment.id, ImageAssignment.is_completed == "pending")
+                .values(is_completed="completed", completed_at=completed_at)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if won:
+                db.refresh(assignment)
+                claimed.append(assignment)
+            else:
+                db.expire(assignment)
+
+    bump_stats(db, agent_id, pending_tasks=-len(claimed), completed_tasks=len(claimed))
+    return claimed
+
+
+def advance_progress(db: Session, agent_id: str, next_index: int = None):
+    """Move TaskProgress forward without ever moving it backwards under concurrency"""
+    if next_index is None:
+        db.execute(
+            update(TaskProgress)
+            .where(TaskProgress.agent_id == agent_id)
+            .values(current_index=TaskProgress.current_index + 1)
+            .execution_options(synchronize_session=False)
+        )
+    else:
+        db.execute(
+            update(TaskProgress)
+            .where(TaskProgress.agent_id == agent_id, TaskProgress.current_index < next_index)
+            .values(current_index=next_index)
+            .execution_options(synchronize_session=False)
+        )
+    return db.query(TaskProgress.current_index).filter(TaskProgress.agent_id == agent_id).scalar()
+
+
+def count_assignments(db: Session, agent_id: str) -> int:
+    return db.query(func.count(ImageAssignment.id)).filter(ImageAssignment.agent_id == agent_id).scalar() or 0
+
+
+def remove_duplicate_positions(db: Session):
+    """Delete extra assignments sharing an (agent_id, position), left by concurrent seeding.
+
+    Of each group a completed row is kept over pending ones, then the oldest.
+    """
+    ranked = select(
+        ImageAssignment.id,
+        func.row_number().over(
+            partition_by=(ImageAssignment.agent_id, ImageAssignment.position),
+            order_by=(case((ImageAssignment.is_completed == "completed", 0), else_=1), ImageAssignment.id)
+        ).label("rank")
+    ).subquery()
+    return db.execute(
+        delete(ImageAssignment)
+        .where(ImageAssignment.id.in_(select(ranked.c.id).where(ranked.c.rank > 1)))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def backfill_all_assignments(db: Session):
+    """Seed assignments for every agent that has images on disk but no rows yet"""
+    seeded = 0
+    for (agent_id,) in db.query(Agent.agent_id).all():
+        if not has_assignments(db, agent_id):
+            seeded += seed_assignments_from_disk(db, agent_id)
+    db.commit()
+    return seeded
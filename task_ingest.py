@@ -0,0 +1,157 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from app.blob_store import store_stream, hash_stream
+
+SUPPORTED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff'}
+MAX_IMAGES_PER_UPLOAD = 5000
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", "4"))
+COPY_BUFFER_SIZE = 1024 * 1024
+
+_ingest_executor = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+
+# Latest upload progress per agent, read by the admin progress endpoint
+_ingest_progress = {}
+_progress_lock = threading.Lock()
+
+
+class IngestProgress:
+    """Thread-safe extracted/total counter for one upload"""
+
+    def __init__(self, agent_id: str, on_update=None):
+        self.agent_id = agent_id
+        self.on_update = on_update
+        self.status = "receiving"
+        self.total = 0
+        self.processed = 0
+        self._publish()
+
+    def set_status(self, status: str, total: int = None):
+        with _progress_lock:
+            self.status = status
+            if total is not None:
+                self.total = total
+        self._publish()
+
+    def advance(self, count: int = 1):
+        with _progress_lock:
+            self.processed += count
+        self._publish()
+
+    def as_dict(self) -> dict:
+        return {
+            "agent_id": self.agent_id,
+            "status": self.status,
+            "processed": self.processed,
+            "total": self.total,
+        }
+
+    def _publish(self):
+        _ingest_progress[self.agent_id] = self.as_dict()
+        if self.on_update:
+            self.on_update(self.processed, self.total)
+
+
+def get_ingest_progress(agent_id: str):
+    return _ingest_progress.get(agent_id)
+
+
+def _spool_to_temp(source) -> str:
+    handle, path = tempfile.mkstemp(suffix=".zip")
+    with os.fdopen(handle, "wb") as destination:
+        source.seek(0)
+        shutil.copyfileobj(source, destination, COPY_BUFFER_SIZE)
+    return path
+
+
+async def spool_upload(upload) -> str:
+    """Copy an UploadFile to a temp file in chunks, off the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_ingest_executor, _spool_to_temp, upload.file)
+
+
+def list_image_members(zip_path: str, limit: int = MAX_IMAGES_PER_UPLOAD) -> list:
+    """Image members of the archive in order, read from the ZIP directory only"""
+    members = []
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        for file_info in zip_ref.infolist():
+            # Skip directories and non-image files
+            if file_info.is_dir():
+                continue
+            if os.path.splitext(file_info.filename.lower())[1] not in SUPPORTED_EXTENSIONS:
+                continue
+            if not os.path.basename(file_info.filename):
+                continue
+
+            members.append(file_info)
+
+            # Limit to prevent excessive uploads
+            if len(members) >= limit:
+                break
+    return members
+
+
+def member_key(file_info: zipfile.ZipInfo):
+    """(crc32, size) as recorded in the ZIP directory, used to find candidate stored images"""
+    return file_info.CRC, file_info.file_size
+
+
+def _store_members(zip_path: str, members: list, progress: IngestProgress = None) -> list:
+    stored = []
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        for file_info in members:
+            with zip_ref.open(file_info) as source_file:
+                digest, path, size, crc = store_stream(source_file, os.path.splitext(file_info.filename)[1])
+            stored.append({"digest": digest, "path": path, "size": size, "crc32": crc})
+            if progress:
+                progress.advance()
+    return stored
+
+
+def _match_members(zip_path: str, members: list, candidates: dict) -> list:
+    matches = []
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        for file_info in members:
+            with zip_ref.open(file_info) as source_file:
+                digest = hash_stream(source_file)
+            matches.append(next((blob for blob in candidates[member_key(file_info)] if blob.digest == digest), None))
+    return matches
+
+
+async def _in_slices(function, zip_path: str, members: list, *args) -> list:
+    """Run function over parallel slices of members on the ingest pool; results follow the input order"""
+    loop = asyncio.get_running_loop()
+    slices = [members[i::INGEST_WORKERS] for i in range(INGEST_WORKERS)]
+    results = await asyncio.gather(*[
+        loop.run_in_executor(_ingest_executor, function, zip_path, members_slice, *args)
+        for members_slice in slices
+    ])
+
+    # Undo the round-robin split
+    ordered = [None] * len(members)
+    for offset, slice_results in enumerate(results):
+        ordered[offset::INGEST_WORKERS] = slice_results
+    return ordered
+
+
+async def store_images(zip_path: str, members: list, progress: IngestProgress = None) -> list:
+    """Hash and store members in parallel on the ingest pool"""
+    return await _in_slices(_store_members, zip_path, members, progress)
+
+
+async def match_known_images(zip_path: str, members: list, candidates: dict) -> dict:
+    """Members whose sha256 matches one of their (crc32, size) candidate blobs, mapped to that blob.
+
+    Matching members are only hashed, never copied.
+    """
+    matches = await _in_slices(_match_members, zip_path, members, candidates)
+    return {member: blob for member, blob in zip(members, matches) if blob is not None}
+
+
+async def read_image_members(zip_path: str) -> list:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_ingest_executor, list_image_members, zip_path)
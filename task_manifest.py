@@ -0,0 +1,95 @@
+import os
+import threading
+
+# Root folder for all task images and the shared fallback folder
+TASK_IMAGES_ROOT = "static/task_images"
+FALLBACK_FOLDER = "crime_records_wide"
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+
+class TaskManifest:
+    """Ordered list of task images for one folder, with O(1) lookup by index"""
+
+    def __init__(self, folder: str, url_prefix: str, images: list, mtime_ns: int):
+        self.folder = folder
+        self.url_prefix = url_prefix
+        self.images = images
+        self.mtime_ns = mtime_ns
+        self._positions = {name: index for index, name in enumerate(images)}
+
+    def __len__(self):
+        return len(self.images)
+
+    def image_name(self, index: int):
+        if 0 <= index < len(self.images):
+            return self.images[index]
+        return None
+
+    def image_url(self, index: int):
+        name = self.image_name(index)
+        return f"{self.url_prefix}/{name}" if name else None
+
+    def index_of(self, image_name: str):
+        return self._positions.get(image_name)
+
+
+_EMPTY_MANIFEST = TaskManifest("", "", [], 0)
+_manifests = {}
+_manifests_lock = threading.Lock()
+
+
+def agent_folder(agent_id: str) -> str:
+    return f"{TASK_IMAGES_ROOT}/agent_{agent_id}"
+
+
+def _resolve_folder(agent_id: str):
+    """Return (folder, mtime_ns) for the agent, falling back to the shared folder"""
+    for folder in (agent_folder(agent_id), f"{TASK_IMAGES_ROOT}/{FALLBACK_FOLDER}"):
+        try:
+            return folder, os.stat(folder).st_mtime_ns
+        except OSError:
+            continue
+    return None, 0
+
+
+def list_images(folder: str) -> list:
+    """Sorted original task images in a folder (derived variants are skipped)"""
+    with os.scandir(folder) as entries:
+        return sorted(
+            entry.name for entry in entries
+            if entry.name.lower().endswith(IMAGE_EXTENSIONS) and entry.is_file()
+        )
+
+
+def _build_manifest(folder: str, mtime_ns: int) -> TaskManifest:
+    return TaskManifest(folder, f"/{folder}", list_images(folder), mtime_ns)
+
+
+def get_task_manifest(agent_id: str) -> TaskManifest:
+    """Get the cached manifest for an agent, rebuilding it only when the folder changed"""
+    folder, mtime_ns = _resolve_folder(agent_id)
+    if folder is None:
+        return _EMPTY_MANIFEST
+
+    manifest = _manifests.get(agent_id)
+    if manifest is not None and manifest.folder == folder and manifest.mtime_ns == mtime_ns:
+        return manifest
+
+    with _manifests_lock:
+        manifest = _manifests.get(agent_id)
+        if manifest is None or manifest.folder != folder or manifest.mtime_ns != mtime_ns:
+            try:
+                manifest = _build_manifest(folder, mtime_ns)
+            except OSError:
+                return _EMPTY_MANIFEST
+            _manifests[agent_id] = manifest
+    return manifest
+
+
+def invalidate_task_manifest(agent_id: str = None):
+    """Drop the cached manifest for one agent (or all agents) after an upload"""
+    with _manifests_lock:
+        if agent_id is None:
+            _manifests.clear()
+        else:
+            _manifests.pop(agent_id, None)
@@ -0,0 +1,46 @@
+import threading
+
+from app.blob_store import register_blobs
+from app.models import ImageBlob
+
+
+def _blob(digest: str) -> dict:
+    return {"digest": digest, "path": f"static/blobs/{digest[:2]}/{digest}.png", "size": 10, "crc32": 1}
+
+
+def test_register_same_digest_from_two_sessions(session_factory):
+    digest = "a" * 64
+    first, second = session_factory(), session_factory()
+
+    assert register_blobs(first, [_blob(digest)]) == 1
+    first.commit()
+    # Already registered by the other session: skipped, not a UNIQUE violation
+    assert register_blobs(second, [_blob(digest)]) == 0
+    second.commit()
+
+    assert first.query(ImageBlob).filter(ImageBlob.digest == digest).count() == 1
+
+
+def test_concurrent_ingests_register_shared_digests(session_factory):
+    # The same new ZIP uploaded to two agents at once
+    digests = [f"{index:064x}" for index in range(1, 51)]
+    sessions = [session_factory(), session_factory()]
+    barrier = threading.Barrier(len(sessions))
+    errors = []
+
+    def ingest(db):
+        barrier.wait()
+        try:
+            register_blobs(db, [_blob(digest) for digest in digests])
+            db.commit()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=ingest, args=(db,)) for db in sessions]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert sessions[0].query(ImageBlob).filter(ImageBlob.digest.in_(digests)).count() == len(digests)
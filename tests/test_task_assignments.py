@@ -0,0 +1,52 @@
+import threading
+
+import pytest
+
+from app.models import Agent, AgentStats, ImageAssignment
+from app.task_assignments import get_or_seed_next_assignment
+
+IMAGES = ["record_1.png", "record_2.png", "record_3.png"]
+
+
+@pytest.fixture
+def agent_on_disk(tmp_path, monkeypatch, session_factory):
+    """An agent with task images in its folder and no assignment rows yet"""
+    monkeypatch.chdir(tmp_path)
+    agent_id = "AGT000001"
+    folder = tmp_path / "static" / "task_images" / f"agent_{agent_id}"
+    folder.mkdir(parents=True)
+    for name in IMAGES:
+        (folder / name).write_bytes(b"")
+
+    db = session_factory()
+    db.add(Agent(agent_id=agent_id, name="Test", email=f"{agent_id}@example.com", mobile="0",
+                 country="US", gender="other", hashed_password="x"))
+    db.commit()
+    return agent_id
+
+
+def test_concurrent_first_requests_seed_once(agent_on_disk, session_factory):
+    sessions = [session_factory() for _ in range(4)]
+    barrier = threading.Barrier(len(sessions))
+    errors, firsts = [], []
+
+    def first_request(db):
+        barrier.wait()
+        try:
+            firsts.append(get_or_seed_next_assignment(db, agent_on_disk).image_filename)
+            db.commit()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=first_request, args=(db,)) for db in sessions]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    db = session_factory()
+    assert errors == []
+    assert firsts == [IMAGES[0]] * len(sessions)
+    assert db.query(ImageAssignment).filter(ImageAssignment.agent_id == agent_on_disk).count() == len(IMAGES)
+    stats = db.get(AgentStats, agent_on_disk)
+    assert (stats.total_tasks, stats.pending_tasks) == (len(IMAGES), len(IMAGES))